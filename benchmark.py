@@ -0,0 +1,170 @@
+"""
+Benchmarks for the render pipeline, using a fake terminal.
+
+The terminal has a fixed size and cursor position, and everything written to it is
+just counted, so the results don't depend on the real terminal (or on having one).
+Results are printed as JSON, so they can be saved and compared between releases:
+
+	python benchmark.py -o results.json
+	python benchmark.py --compare results.json
+"""
+
+import argparse, json, os, platform, sys
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Iterator
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))	# benchmark this tree, not the installed one
+
+import pbar
+from pbar import backend
+
+
+TERM_SIZE = (120, 40)
+CURSOR_POS = (1, 20)
+SIZES = ((20, 1), (50, 3), (100, 10), (-10, -10))
+
+
+
+
+class _CountingBackend(backend.MemoryBackend):
+	"""Fake terminal that counts the bytes written to it (encoded as UTF-8), instead of storing them."""
+	def __init__(self, size: tuple[int, int], pos: tuple[int, int]) -> None:
+		super().__init__(size, pos)
+		self.bytes = 0
+		self.writes = 0
+
+	def write(self, s: str) -> None:
+		self.bytes += len(s.encode())
+		self.writes += 1
+
+	def reset(self) -> None:
+		self.bytes = self.writes = 0
+
+
+
+
+@contextmanager
+def fake_terminal(size: tuple[int, int] = TERM_SIZE, cursor_pos: tuple[int, int] = CURSOR_POS) -> Iterator[_CountingBackend]:
+	"""Make PBar draw to a fake terminal with the size and cursor position supplied."""
+	sink = _CountingBackend(size, cursor_pos)
+	backend.set_backend(sink)
+	try:
+		yield sink
+	finally:
+		backend.set_backend(None)
+
+
+def get_const_attrs(obj: Any) -> list[tuple[str, Any]]:
+	return [(x, getattr(obj, x)) for x in dir(obj) if x.isupper() and not x.startswith("_")]
+
+
+# ------------------------------- Benchmarks -------------------------------
+
+
+def bench_draw(sink: _CountingBackend, frames: int, **kwargs) -> dict:
+	"""Draw a bar `frames` times, advancing its progress on each frame."""
+	bar = pbar.PBar(prange=(0, frames), max_fps=None, **kwargs)
+	bar.draw()
+	sink.reset()
+
+	start = perf_counter()
+	for i in range(1, frames + 1):
+		bar.prange = (i, frames)
+		bar.draw()
+	elapsed = perf_counter() - start
+
+	bar.clear()
+	return {
+		"fps": round(frames / elapsed, 1),
+		"bytes_per_frame": round(sink.bytes / frames, 1),
+	}
+
+
+def bench_iter(sink: _CountingBackend, items: int, max_fps) -> dict:
+	"""Iterate over a range with `pbar.iter`, with the throttling supplied."""
+	sink.reset()
+
+	start = perf_counter()
+	for _ in pbar.iter(range(items), pbar.PBar(max_fps=max_fps)):
+		pass
+	elapsed = perf_counter() - start
+
+	return {
+		"us_per_item": round(elapsed / items * 1e6, 3),
+		"writes": sink.writes,
+		"bytes_per_item": round(sink.bytes / items, 2),
+	}
+
+
+def run(frames: int, items: int) -> dict:
+	"""Run all the benchmarks, and return the results."""
+	results: dict[str, dict] = {}
+
+	with fake_terminal() as sink:
+		for gen in pbar.ContentGens.get_gens():
+			for size in SIZES:
+				results[f"draw/contentg={gen.__name__}/size={size[0]}x{size[1]}"] = bench_draw(
+					sink, frames, contentg=gen, size=size
+				)
+
+		for set_name, set_cls in (
+			("charset", pbar.CharSet), ("colorset", pbar.ColorSet), ("formatset", pbar.FormatSet)
+		):
+			for name, value in get_const_attrs(set_cls):
+				results[f"draw/{set_name}={name}"] = bench_draw(sink, frames, **{set_name: value})
+
+		results["iter/max_fps=None"] = bench_iter(sink, items, None)
+		results["iter/max_fps=30"] = bench_iter(sink, items, 30)
+
+	return {
+		"meta": {
+			"pbar_version": pbar.__version__,
+			"python": platform.python_version(),
+			"implementation": platform.python_implementation(),
+			"terminal_size": TERM_SIZE,
+			"frames": frames,
+			"items": items,
+		},
+		"results": results,
+	}
+
+
+def compare(old: dict, new: dict) -> str:
+	"""Return a table with the relative change of each metric between two runs."""
+	lines = []
+	for name, metrics in new["results"].items():
+		if (old_metrics := old["results"].get(name)) is None:
+			continue
+		changes = (
+			f"{metric}: {old_metrics[metric]} -> {value} ({(value / old_metrics[metric] - 1)*100:+.1f}%)"
+			for metric, value in metrics.items()
+			if old_metrics.get(metric)
+		)
+		lines.append(f"{name:<45}" + "  ".join(changes))
+	return "\n".join(lines)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("-o", "--output", help="file to save the results to, instead of printing them")
+	parser.add_argument("--compare", metavar="FILE", help="results of a previous run to compare with")
+	parser.add_argument("--frames", type=int, default=200, help="frames drawn for each draw benchmark")
+	parser.add_argument("--items", type=int, default=100_000, help="items iterated for each iter benchmark")
+	args = parser.parse_args()
+
+	results = run(args.frames, args.items)
+
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as file:
+			json.dump(results, file, indent=4)
+	else:
+		print(json.dumps(results, indent=4))
+
+	if args.compare:
+		with open(args.compare, "r", encoding="utf-8") as file:
+			print(compare(json.load(file), results), file=sys.stderr)
+
+
+if __name__ == "__main__":
+	main()
@@ -11,12 +11,24 @@
 
 __version__ = "2.2.2"
 
+import importlib
+
 from . bar import PBar, iter, animate, bar_helper
+from . render import RenderThread
+from . group import BarGroup
 from . task_wrapper import task_wrapper
 from . sets import CharSet, FormatSet, ColorSet
 from . cond import Cond
 from . gen import ContentGens
 from . utils import Term
+from . import backend
+
+
+def __getattr__(name: str):
+	# these modules are only imported when used, since asyncio and multiprocessing are slow to import
+	if name in ("aio", "mp"):
+		return importlib.import_module(f".{name}", __name__)
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░
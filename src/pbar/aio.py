@@ -0,0 +1,114 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import (
+	AsyncGenerator, AsyncIterable, Awaitable,
+	Callable, Iterable, Optional
+)
+
+from . import bar, render, utils
+from . utils import T
+
+
+
+@asynccontextmanager
+async def _rendering(bars: tuple["bar.PBar", ...], fps: float):
+	"""
+	Draw the bars with a render thread while in the context. Stepping the bars only adds to a counter,
+	and all the drawing happens outside of the event loop, so a slow terminal never blocks it.
+	"""
+	thread = render.RenderThread(*bars, fps=fps)
+	thread.start()
+	try:
+		yield thread
+	finally:
+		await _run_blocking(thread.stop)	# stopping draws the pending steps
+
+
+async def _run_blocking(func: Callable[[], None]) -> None:
+	"""Run a blocking function in the default executor of the running loop."""
+	await asyncio.get_running_loop().run_in_executor(None, func)
+
+
+async def _clear(bars: tuple["bar.PBar", ...]) -> None:
+	def clear() -> None:
+		with utils.Stdout.lock:
+			bar._print_bars_str("".join(bar_obj._render_clear() for bar_obj in bars))
+	await _run_blocking(clear)
+
+
+async def refresh(*bars: "bar.PBar", fps: float = 20) -> None:
+	"""
+	Draw the bars supplied at a fixed rate until cancelled, from a separate thread.
+	Use this as a task while the bars are stepped by other coroutines.
+
+	>>> task = asyncio.create_task(pbar.aio.refresh(my_bar))
+	>>> await asyncio.gather(*(work(my_bar) for _ in range(1000)))
+	>>> task.cancel()
+
+	@bars: PBar objects to draw.
+	@fps: Number of times per second that the bars will be drawn.
+	"""
+	async with _rendering(bars, fps):
+		await asyncio.get_running_loop().create_future()	# wait until cancelled
+
+
+async def iter(
+	aiterable: AsyncIterable[T],
+	*bars: "bar.PBar",
+	length: int = None,
+	clear: bool = True,
+	set_title: bool = False,
+	fps: float = 20
+) -> AsyncGenerator[T, None]:
+	"""
+	Yield all the values of the given async iterable, while stepping
+	the progress bar/s.
+	@aiterable: Async iterable object to iterate.
+	@bars: PBar objects to use.
+	@length: Length of the object to iterate.
+	(Use this if the iterable has no length, which is common for async iterables.)
+	@clear: Clear the progress bar after finishing the iteration.
+	@set_title: Set the title of the progress bar to the string representation
+	of each yielded value.
+	@fps: Number of times per second that the bars will be drawn.
+	"""
+	if not bars:
+		bars = (bar.PBar(), )
+
+	for bar_obj in bars:
+		bar_obj.prange = (0, (length if length is not None else len(aiterable)))
+
+	async with _rendering(bars, fps):
+		async for x in aiterable:
+			yield x
+			for bar_obj in bars:
+				bar_obj.step(text=str(x) if set_title else None)
+
+	if clear:
+		await _clear(bars)
+
+
+async def as_completed(
+	aws: Iterable[Awaitable[T]],
+	*bars: "bar.PBar",
+	timeout: Optional[float] = None,
+	clear: bool = True,
+	fps: float = 20
+) -> AsyncGenerator[T, None]:
+	"""
+	Yield the results of the awaitables supplied as they complete (like `asyncio.as_completed`),
+	while stepping the progress bar/s.
+	@aws: Awaitable objects to run.
+	@bars: PBar objects to use.
+	@timeout: Raise `asyncio.TimeoutError` if not all the awaitables are done after this many seconds.
+	@clear: Clear the progress bar after finishing.
+	@fps: Number of times per second that the bars will be drawn.
+	"""
+	aws = list(aws)
+
+	async def results() -> AsyncGenerator[T, None]:
+		for future in asyncio.as_completed(aws, timeout=timeout):
+			yield await future
+
+	async for result in iter(results(), *bars, length=len(aws), clear=clear, fps=fps):
+		yield result
@@ -0,0 +1,217 @@
+import io, sys, weakref
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Optional, TextIO
+
+from . utils import Term, Stdout
+
+if TYPE_CHECKING:
+	from . bar import PBar
+
+
+
+class Backend(ABC):
+	"""
+	Output where the bars are drawn. Subclass this to draw the bars somewhere else.
+
+	Backends that are terminals receive the escape sequences that draw the bars. The rest
+	of them are asked to `render()` each bar instead, so no escape sequences are generated.
+	"""
+	is_terminal: bool = True
+
+
+	@abstractmethod
+	def write(self, s: str) -> None:
+		"""Write the string that draws one or more bars."""
+
+
+	def flush(self) -> None:
+		"""Flush the output."""
+
+
+	def get_size(self) -> tuple[int, int]:
+		"""Return the size of the output. Columns and rows."""
+		return (0, 0)
+
+
+	def get_pos(self) -> tuple[int, int]:
+		"""Return the position of the cursor. Returns (-1, -1) if not supported."""
+		return (-1, -1)
+
+
+	def render(self, bar_obj: "PBar") -> str:
+		"""
+		Return the string that shows the progress of the bar supplied.
+		Only used by backends that are not terminals.
+		"""
+		return ""
+
+
+	def render_clear(self, bar_obj: "PBar") -> str:
+		"""Return the string that clears the bar supplied. Only used by backends that are not terminals."""
+		return ""
+
+
+
+
+class TermBackend(Backend):
+	"""Draw the bars on the terminal. This is the default backend if the terminal is supported."""
+	def __init__(self, file: Optional[TextIO] = None) -> None:
+		"""@file: Stream to write to. By default, the original `sys.stdout`."""
+		self.file = file
+
+
+	@property
+	def _file(self) -> TextIO:
+		return self.file or getattr(sys.stdout, "original", sys.stdout)
+
+
+	def write(self, s: str) -> None:
+		self._file.write(s)
+		self._file.flush()
+
+
+	def flush(self) -> None:
+		self._file.flush()
+
+
+	def get_size(self) -> tuple[int, int]:
+		return Term.get_size()
+
+
+	def get_pos(self) -> tuple[int, int]:
+		return Stdout.cursor.get_pos(file=self._file)
+
+
+
+
+class MemoryBackend(Backend):
+	"""
+	Draw the bars to memory, like a terminal of a fixed size.
+	Useful for testing, or for sending the output somewhere else.
+
+	>>> backend.set_backend(mem := MemoryBackend((80, 24)))
+	>>> my_bar.draw()
+	>>> mem.getvalue()
+	"""
+	def __init__(self, size: tuple[int, int] = (80, 24), pos: tuple[int, int] = (1, 1)) -> None:
+		"""
+		@size: Size of the fake terminal.
+		@pos: Position of the cursor in the fake terminal.
+		"""
+		self.size = size
+		self.pos = pos
+		self.buffer = io.StringIO()
+
+
+	def write(self, s: str) -> None:
+		self.buffer.write(s)
+
+
+	def get_size(self) -> tuple[int, int]:
+		return self.size
+
+
+	def get_pos(self) -> tuple[int, int]:
+		return self.pos
+
+
+	def getvalue(self) -> str:
+		"""Return all the output written."""
+		return self.buffer.getvalue()
+
+
+	def clear(self) -> None:
+		"""Discard all the output written."""
+		self.buffer.seek(0)
+		self.buffer.truncate()
+
+
+
+
+class FileBackend(Backend):
+	"""
+	Write the progress of the bars as plain lines of text, without escape sequences.
+	Useful for files, pipes, CI logs, etc.
+
+	A new line is written for each bar only when its percentage increases (or decreases) by `step`,
+	or when it reaches 100%, so the output stays compact.
+	"""
+	is_terminal = False
+
+
+	def __init__(self, file: Optional[TextIO] = None, step: int = 10) -> None:
+		"""
+		@file: Stream to write to. By default, `sys.stderr`.
+		@step: Percentage that a bar needs to advance to write a new line.
+		"""
+		self.file = file
+		self.step = step
+		self._last: weakref.WeakKeyDictionary["PBar", int] = weakref.WeakKeyDictionary()	# percentage of the last line of each bar
+
+
+	@property
+	def _file(self) -> TextIO:
+		return self.file or sys.stderr
+
+
+	def write(self, s: str) -> None:
+		self._file.write(s)
+		self._file.flush()
+
+
+	def flush(self) -> None:
+		self._file.flush()
+
+
+	def render(self, bar_obj: "PBar") -> str:
+		percentage = bar_obj.percentage
+		last = self._last.get(bar_obj)
+		if percentage == last or last is not None and percentage != 100 and abs(percentage - last) < self.step:
+			return ""
+
+		self._last[bar_obj] = percentage
+		prange = bar_obj.prange
+		return (
+			(f"{bar_obj.text}: " if bar_obj.text else "")
+			+ f"{percentage}% ({prange[0]}/{prange[1]})\n"
+		)
+
+
+	def render_clear(self, bar_obj: "PBar") -> str:
+		# lines can't be cleared, so we just write the final progress if it was not written yet
+		line = self.render(bar_obj) if bar_obj in self._last else ""
+		self._last.pop(bar_obj, None)	# start again if the bar is drawn later
+		return line
+
+
+
+
+class NullBackend(Backend):
+	"""Discard everything. This is the default backend if the terminal is not supported."""
+	is_terminal = False
+
+
+	def write(self, s: str) -> None:
+		pass
+
+
+
+
+_backend: Optional[Backend] = None
+
+
+def get_backend() -> Backend:
+	"""Return the backend used to draw the bars."""
+	global _backend
+	if _backend is None:
+		_backend = TermBackend() if Term.SUPPORTED else NullBackend()
+	return _backend
+
+
+def set_backend(backend: Optional[Backend]) -> None:
+	"""
+	Set the backend used to draw the bars.
+	@backend: The new backend. `None` will select the default backend again.
+	"""
+	global _backend
+	_backend = backend
@@ -1,31 +1,39 @@
+import threading
 from time import time as epochTime, sleep
-import sys
 from typing import (
 	Generator, Iterable,
 	Optional, SupportsInt, Union, IO
 )
 
-from . import utils, gen, sets, cond
+from . import utils, gen, sets, cond, render, group
+from . backend import get_backend
 from . utils import Term, T
 
 
 
-NEVER_DRAW = not Term.SUPPORTED
+NEVER_DRAW = False	# If True, the bars will never be drawn, whatever the backend is.
 DEBUG = False
 
-# we override stdout so we can keep track of the number of newlines
-sys.stdout = utils.Stdout(sys.stdout)
-
 
 
 Position = tuple[Union[str, int], Union[str, int]]
 Conditions = Union[list[cond.Cond], cond.Cond]
 
+_EMPTY_COLORSET = sets.ColorSet(sets.ColorSet.EMPTY)	# used when clearing the bar
+
 
 
 
 class PBar:
 	"""Object for managing a progress bar."""
+	__slots__ = (
+		"enabled", "text", "contentg", "inverted", "_size", "_position", "_centered", "_geometry",
+		"_time", "_is_on_screen", "_redraw_on_scroll", "_frame", "_layers", "_content",
+		"_scheduler", "_steps", "_steps_lock", "_render_thread", "_group", "_cond_index",
+		"_range", "_colorset", "_charset", "_formatset", "_conditions", "_old_values",
+		"__weakref__"
+	)
+
 	def __init__(self,
 		*,
 		prange: tuple[int, int] = (0, 1),
@@ -39,6 +47,8 @@ class PBar:
 		contentg: gen.BContentGen = gen.ContentGens.auto,
 		inverted: bool = False,
 		centered: bool = True,
+		max_fps: Optional[float] = 30,
+		min_delta: float = 0,
 	) -> None:
 		"""
 		### Detailed descriptions:
@@ -109,26 +119,51 @@ class PBar:
 		---
 
 		@centered: If `True`, the bar will be centered around the position specified by `position`.
+
+		---
+
+		@max_fps: Maximum number of times per second that `step()` will draw the bar. Steps done in between are
+		coalesced into the next frame. `None` or `0` will make the bar draw on every step.
+
+		- The step that gets the bar to 100%, and steps that only change the text, are always drawn.
+
+		---
+
+		@min_delta: Minimum change of the percentage of the bar required for `step()` to draw the bar, unless
+		the text changes.
+
+		- Calling `draw()` or `done()` will always draw the bar.
 		"""
 		self.enabled = True				# If disabled, the bar will never draw.
 		self._time = epochTime()		# The elapsed time since the bar created.
 		self._is_on_screen = False		# Is the bar on screen?
 		self._redraw_on_scroll = True	# If the bar is on screen, should it redraw when the terminal scrolls?
+		self._frame: Optional[render.Frame] = None	# Cells of the bar currently on screen. Used to only redraw what changed.
+		self._layers: Optional[render.Layers] = None	# Layers of the frame on screen. Used to only generate the content that changed.
+		self._content: Optional[gen.BContentGenMgr] = None	# Generates the content of the bar. Updated on each frame.
+		self._scheduler = render.Scheduler(max_fps, min_delta)	# Decides when stepping the bar should draw it.
+		self._steps = render.StepCounter()		# Steps not applied yet. Each thread that steps the bar adds to its own cell.
+		self._steps_lock = threading.Lock()		# Held while applying the steps to the range of the bar.
+		self._render_thread: Optional[render.RenderThread] = None	# Render thread the bar is attached to.
+		self._group: Optional["group.BarGroup"] = None	# Group of bars the bar is drawn with.
+		self._cond_index: Optional[cond.CondIndex] = None	# Conditions indexed by their thresholds. Built when checked.
+		self._geometry: Optional[tuple] = None	# Size of the terminal and computed values for it. Cleared when the bar moves or resizes.
 
 		self._range = PBar._get_range(prange)
 		self.text = text if text is not None else ""
 		self.size = size
 		self.position = position
-		self._colorset = sets.ColorSet(colorset)
-		self._charset = sets.CharSet(charset)
-		self._formatset = sets.FormatSet(formatset)
+		# the default sets are only created when they are used, since that takes longer than all the rest
+		self._colorset: Optional[sets.ColorSet] = sets.ColorSet(colorset) if colorset else None
+		self._charset: Optional[sets.CharSet] = sets.CharSet(charset) if charset else None
+		self._formatset: Optional[sets.FormatSet] = sets.FormatSet(formatset) if formatset else None
 		self._conditions = PBar._get_conds(conditions)
 		self.contentg = contentg
 		self.inverted = inverted
 		self.centered = centered
 
-		utils.Stdout.add_trigger(self)
-		self._old_values = (*self.computed_values, self._formatset.parsed_values(self))	# This values are used when clearing the old position of the bar (when self._requiresClear is True)
+		# Position, size and formatset of the bar on screen, used to clear it. Computed when first drawn.
+		self._old_values: Optional[tuple[tuple[int, int], tuple[int, int], sets.FormatSet]] = None
 
 
 	# -------------------- Properties / Methods the user should use. --------------------
@@ -136,36 +171,38 @@ class PBar:
 
 	def draw(self):
 		"""Print the progress bar on screen."""
-
-		self._print_str(
-			self._gen_cleared_bar(*self._old_values)	# Clear the bar at the old position and size
-			+ self._gen_bar()	# draw at the new position and size
-		)
-
-		self._old_values = (*self.computed_values, self._formatset.parsed_values(self))	# Reset the old values
+		with utils.Stdout.lock:
+			self._print_str(self._render())
 
 
 	def step(self, steps: int = 1, text: str = None):
 		"""
 		Add `steps` to the first value in prange, then draw the bar.
+		If the bar is attached to a `RenderThread`, the steps will be applied when the thread draws it.
+		Multiple threads can step the bar at the same time.
+
+		The frames are limited to `max_fps` (30 by default), so the bar may not be drawn on every step.
+		The step that gets the bar to 100% is always drawn, but if the loop stops before that,
+		call `draw()` to show its final state.
 		@steps: Value to add to the first value in prange.
 		@text: Text to be displayed on the bar.
 		"""
-		self.prange = (self._range[0] + steps, self._range[1])
-		if text is not None: self.text = text
-		self.draw()
+		if self._step(steps, text):
+			self.draw()
 
 
 	def clear(self):
-		"""Clear the progress bar."""
-		self._print_str(self._gen_cleared_bar(*self._old_values))
+		"""Clear the progress bar. This detaches the bar from its `RenderThread`."""
+		if self._render_thread is not None:
+			self._render_thread.remove(self)
+		with utils.Stdout.lock:
+			self._print_str(self._render_clear())
 
 
 	def done(self, text: str = None):
 		"""Set the progress bar to 100% and draw it."""
-		self.percentage = 100
-		if text is not None: self.text = text
-		self.draw()
+		if self._set_done(text):
+			self.draw()
 
 
 	def reset_etime(self):
@@ -193,10 +230,30 @@ class PBar:
 		self.prange = (perc, crange[1])
 
 
+	@property
+	def max_fps(self) -> Optional[float]:
+		"""Maximum number of times per second that `step()` will draw the bar."""
+		return self._scheduler.max_fps
+	@max_fps.setter
+	def max_fps(self, max_fps: Optional[float]):
+		self._scheduler.max_fps = max_fps
+
+
+	@property
+	def min_delta(self) -> float:
+		"""Minimum change of the percentage of the bar required for `step()` to draw the bar."""
+		return self._scheduler.min_delta
+	@min_delta.setter
+	def min_delta(self, min_delta: float):
+		self._scheduler.min_delta = min_delta
+
+
 	@property
 	def colorset(self) -> sets.ColorSet:
 		"""Set of colors for the bar."""
-		return self._colorset
+		if (colorset := self._colorset) is None:
+			colorset = self._colorset = sets.ColorSet(None)
+		return colorset
 	@colorset.setter
 	def colorset(self, colorset: sets.ColorSetEntry):
 		self._colorset = sets.ColorSet(colorset)
@@ -205,7 +262,9 @@ class PBar:
 	@property
 	def charset(self) -> sets.CharSet:
 		"""Set of characters for the bar."""
-		return self._charset
+		if (charset := self._charset) is None:
+			charset = self._charset = sets.CharSet(None)
+		return charset
 	@charset.setter
 	def charset(self, charset: sets.CharSetEntry):
 		self._charset = sets.CharSet(charset)
@@ -214,18 +273,60 @@ class PBar:
 	@property
 	def formatset(self) -> sets.FormatSet:
 		"""Formatting used for the bar."""
-		return self._formatset
+		if (formatset := self._formatset) is None:
+			formatset = self._formatset = sets.FormatSet(None)
+		return formatset
 	@formatset.setter
 	def formatset(self, formatset: sets.FormatSetEntry):
 		self._formatset = sets.FormatSet(formatset)
 
 
+	@property
+	def size(self) -> tuple[int, int]:
+		"""Size of the bar. Negative values are relative to the size of the terminal."""
+		return self._size
+	@size.setter
+	def size(self, size: tuple[int, int]):
+		self._size = size
+		self._geometry = None
+
+
+	@property
+	def position(self) -> Position:
+		"""Position of the bar. See the `position` parameter of the constructor."""
+		return self._position
+	@position.setter
+	def position(self, position: Position):
+		self._position = position
+		self._geometry = None
+
+
+	@property
+	def centered(self) -> bool:
+		"""Is the position of the bar the position of its center?"""
+		return self._centered
+	@centered.setter
+	def centered(self, centered: bool):
+		self._centered = centered
+		self._geometry = None
+
+
 	@property
 	def computed_values(self) -> tuple[tuple[int, int], tuple[int, int]]:
-		"""Computed position and size of the progress bar."""
-		size = gen.get_computed_size(self.size, size_offset=(4, 2), min_size=(1, 1))
-		pos = gen.get_computed_position(self.position, size, (3, 1), self.centered)
+		"""
+		Computed position and size of the progress bar.
+		They are only computed again if the bar moved or resized, or if the terminal resized.
+		"""
+		term_size = get_backend().get_size()
+		if (geometry := self._geometry) is not None and geometry[0] == term_size:
+			return geometry[1]
+
+		size = gen.get_computed_size(self._size, size_offset=(4, 2), min_size=(1, 1))
+		pos = gen.get_computed_position(self._position, size, (3, 1), self._centered)
 
+		# positions relative to the cursor depend on where the cursor is each time
+		if not any(isinstance(value, str) and value.startswith("r") for value in self._position):
+			self._geometry = (term_size, (pos, size))
 		return pos, size
 
 
@@ -257,8 +358,9 @@ class PBar:
 	@staticmethod
 	def _get_range(range: tuple[SupportsInt, SupportsInt]) -> tuple[int, int]:
 		"""Return a capped range"""
-		utils.chk_seq_of_len(range, 2, "prange")
-		start, stop = map(int, range)
+		if type(range) is not tuple or len(range) != 2:	# checked only if needed, since it's slow
+			utils.chk_seq_of_len(range, 2, "prange")
+		start, stop = int(range[0]), int(range[1])
 		return (utils.cap_value(start, stop, 0),
 				utils.cap_value(stop, min=1))
 
@@ -274,9 +376,142 @@ class PBar:
 			return []
 
 
+	@property
+	def _exact_percentage(self) -> float:
+		return self._range[0]*100 / self._range[1]
+
+
+	def _step(self, steps: int, text: Optional[str]) -> bool:
+		"""Add `steps` to the bar without drawing it. Return `True` if the bar should be drawn now."""
+		self._steps.add(steps)
+		# when only the text changes, the frame is always drawn, since no steps may follow for a while
+		text_only = not steps and text is not None and text != self.text
+		if text is not None: self.text = text
+		if self._render_thread is not None:
+			self._scheduler.pending = True
+			return False
+
+		"""
+		Only one thread applies the steps at a time, while the rest of them just leave their steps
+		in the counter. After releasing the lock, the thread checks if any steps were added while
+		it had it, so the steps of the threads that didn't get the lock are never left behind.
+		Threads that only change the text wait for the lock instead, so their frame is never skipped.
+		"""
+		should_draw = False
+		while self._steps_lock.acquire(blocking=text_only):
+			try:
+				if steps := self._steps.take():
+					self.prange = (self._range[0] + steps, self._range[1])
+				should_draw = self._scheduler.should_draw(self._exact_percentage, self.text, text_only) or should_draw
+			finally:
+				self._steps_lock.release()
+
+			if not self._steps.pending:
+				break
+
+		return should_draw
+
+
+	def _set_done(self, text: Optional[str]) -> bool:
+		"""Set the bar to 100% without drawing it. Return `True` if the bar should be drawn now."""
+		with self._steps_lock:
+			self._steps.take()	# the steps not applied yet don't matter anymore
+			self.percentage = 100
+		if text is not None: self.text = text
+		if self._render_thread is not None:
+			self._scheduler.pending = True	# the render thread will draw it
+			return False
+		return True
+
+
+	def _draw_pending(self) -> None:
+		"""Draw the bar if `step()` skipped any frames since the last one drawn."""
+		if self._scheduler.pending:
+			self.draw()
+
+
+	def _flush_steps(self) -> str:
+		"""
+		Apply the steps added while attached to a render thread.
+		Return the string that draws the bar if it changed.
+		"""
+		with self._steps_lock:
+			if steps := self._steps.take():
+				self.prange = (self._range[0] + steps, self._range[1])
+				self._scheduler.pending = True
+		return self._render() if self._scheduler.pending else ""
+
+
+	def _render(self) -> str:
+		"""
+		Return the string that draws the bar, clearing it first if it moved or changed its size.
+		Returns an empty string if the bar should not be drawn.
+		"""
+		if not (backend := get_backend()).is_terminal:
+			# no escape sequences needed, the backend shows the progress its own way
+			if self._conditions:
+				self._chk_conds()
+			self._scheduler.drawn(self._exact_percentage, self.text)
+			return backend.render(self) if self.enabled and not NEVER_DRAW else ""
+
+		if self._frame is None and self.enabled and not NEVER_DRAW:
+			# the whole bar is going to be drawn, so it may not know yet when it has to be redrawn
+			# (like if it was disabled before). Registering it again does nothing
+			Term.on_resize(self._on_resize)
+			if self._group is None:	# bars in a group are redrawn by the group
+				utils.Stdout.add_trigger(self)
+
+		computed_values = self.check_props()
+		parsed_formatset = self.formatset.parsed_values(self)
+		same_geometry = self._frame is not None and computed_values == self._old_values[:2]
+		layers = self._layers if same_geometry and self._layers and self._layers.screen is self._frame else None
+
+		bar_shape, bar_content, bar_text = self._gen_bar_layers(
+			computed_values, parsed_formatset, layers and layers.prange
+		)
+		key = (
+			bar_shape, self.contentg,
+			bar_content.char_full, bar_content.char_empty, bar_content.color_full, bar_content.color_empty
+		)
+
+		if layers is not None and layers.key == key and (delta := bar_content.delta()) is not None:
+			# only the progress or the text changed, so we just need to generate the content that changed
+			content = layers.update(self._range, delta, bar_text)
+		else:
+			layers = render.Layers(key, self._range, bar_shape, content_string := bar_content(), bar_text)
+			if same_geometry:	# we just need to redraw the cells that changed
+				content = self._frame.diff(layers.screen)
+			else:
+				content = (
+					(self._gen_cleared_bar(*self._old_values) if self._is_on_screen else "")	# Clear the bar at the old position and size
+					+ bar_shape + content_string + bar_text	# draw at the new position and size
+				)
+
+		self._is_on_screen = True
+		drawn = self.enabled and not NEVER_DRAW
+		self._frame, self._layers = (layers.screen, layers) if drawn else (None, None)
+		self._old_values = (*computed_values, parsed_formatset)	# Reset the old values
+		self._scheduler.drawn(self._exact_percentage, self.text)
+
+		return content if drawn else ""
+
+
+	def _render_clear(self) -> str:
+		"""Return the string that clears the bar. Returns an empty string if the bar is disabled."""
+		if not (backend := get_backend()).is_terminal:
+			return backend.render_clear(self) if self.enabled else ""
+
+		self._frame = None
+		utils.Stdout.remove_trigger(self)
+		cleared = self._gen_cleared_bar(*self._old_values) if self._is_on_screen else ""
+		return cleared if self.enabled else ""
+
+
 	def _chk_conds(self) -> None:
-		for cond in self._conditions:
-			cond.chk_and_apply(self)
+		# the list of conditions may be modified in place, so the index is built again when it changes
+		if (index := self._cond_index) is None or index.conditions != tuple(self._conditions):
+			index = self._cond_index = cond.CondIndex(self._conditions)
+		index.chk_and_apply(self)
 
 
 	def check_props(self) -> tuple[tuple[int, int], tuple[int, int]]:
@@ -307,7 +542,7 @@ class PBar:
 		bar_text = gen.b_text(
 			(position[0] + 2, position[1]),
 			(size[0], size[1] + 2),
-			sets.ColorSet(sets.ColorSet.EMPTY).parsed_values(),
+			_EMPTY_COLORSET.parsed_values(),
 			formatset.empty_values()
 		)
 
@@ -315,75 +550,138 @@ class PBar:
 		return bar_text + bar_shape
 
 
-	def _gen_bar(self) -> str:
-		"""Generate the progress bar"""
-		position, size = self.check_props()
-		parsed_colorset = self._colorset.parsed_values()
+	def _gen_bar(self, computed_values: Optional[tuple[tuple[int, int], tuple[int, int]]] = None) -> str:
+		"""
+		Generate the progress bar
+		@computed_values: Position and size of the bar, if they were already checked with `check_props`.
+		"""
+		computed_values = computed_values or self.check_props()
+		parsed_formatset = self.formatset.parsed_values(self)
+		bar_shape, bar_content, bar_text = self._gen_bar_layers(computed_values, parsed_formatset)
+
+		self._is_on_screen = True
+		self._old_values = (*computed_values, parsed_formatset)
+		return bar_shape + bar_content() + bar_text
+
+
+	def _gen_bar_layers(
+		self,
+		computed_values: tuple[tuple[int, int], tuple[int, int]],
+		parsed_formatset: sets.FormatSet,
+		prev_prange: Optional[tuple[int, int]] = None
+	) -> tuple[str, gen.BContentGenMgr, str]:
+		"""
+		Generate the shape and the text of the progress bar, and the manager that generates its content.
+		@prev_prange: The prange of the content currently on screen, for generating only the content that changed.
+		"""
+		position, size = computed_values
+		parsed_colorset = self.colorset.parsed_values()
+		charset = self.charset
 
 		# Build all the parts of the progress bar
 		bar_shape = gen.b_shape(
 			position,
 			(size[0] + 4, size[1] + 2),
-			self._charset,
+			charset,
 			parsed_colorset
 		)
 
-		bar_content = gen.BContentGenMgr(
+		content_args = (
 			self.contentg,
 			self.inverted,
 			(position[0] + 2, position[1] + 1),
 			size,
-			self._charset,
+			charset,
 			parsed_colorset,
-			self._range
-		)()
+			self._range,
+			prev_prange
+		)
+		if (bar_content := self._content) is None:
+			bar_content = self._content = gen.BContentGenMgr(*content_args)
+		else:
+			bar_content.update(*content_args)	# the manager of the previous frame is not used anymore
 
 		bar_text = gen.b_text(
 			(position[0] + 2, position[1]),
 			(size[0], size[1] + 2),
 			parsed_colorset,
-			self._formatset.parsed_values(self)
+			parsed_formatset
 		)
 
-		self._is_on_screen = True
-		return bar_shape + bar_content + bar_text
+		return bar_shape, bar_content, bar_text
+
+
+	def _on_resize(self) -> None:
+		"""Called when the terminal is resized. The next frame will repaint the whole bar."""
+		self._frame = None
+		if self._is_on_screen:
+			self._scheduler.pending = True
 
 
 	def _redraw_with_offset(self, count: int):
+		if self._group is None:	# bars in a group are redrawn by the group
+			with utils.Stdout.lock:
+				self._print_str(self._render_with_offset(count))
+
+
+	def _render_with_offset(self, count: int) -> str:
+		"""Return the string that clears the bar `count` lines above its old position, and draws it again."""
 		if not self._is_on_screen or not self._redraw_on_scroll:
-			return
+			return ""
 
 		pos, size, formatset = self._old_values
-		self._print_str(
-			self._gen_cleared_bar(
-				(pos[0], pos[1] - count),
-				size,
-				formatset
-			)
+		if self._render_thread is not None:
+			# let the render thread clear the bar at the new position and draw it again
+			self._old_values = ((pos[0], pos[1] - count), size, formatset)
+			self._frame = None
+			self._scheduler.pending = True
+			return ""
+
+		cleared = self._gen_cleared_bar(
+			(pos[0], pos[1] - count),
+			size,
+			formatset
 		)
-		self.draw()
+		self._frame = None	# the screen moved, so the old frame is not valid anymore
+		return (cleared if self.enabled else "") + self._render()
 
 
 	def _print_str(self, bar_string: str):
 		"""Prints string to stream"""
-		if not self.enabled or NEVER_DRAW:
+		if not self.enabled:
 			return
+		_print_bars_str(bar_string)
 
+
+
+
+
+def _print_bars_str(bars_string: str) -> None:
+	"""Prints the string of one or more bars to the backend, hiding the cursor and restoring its position after."""
+	if NEVER_DRAW or not bars_string:
+		return
+
+	if not (backend := get_backend()).is_terminal:
+		with utils.Stdout.lock:	# only one thread writes at a time, so the frames are never mixed
+			backend.write(bars_string)
+		return
+
+	content = (
+		Term.CURSOR_SAVE + Term.CURSOR_HIDE
+		+ bars_string
+		+ Term.CURSOR_LOAD + Term.CURSOR_SHOW + Term.RESET
+	)
+
+	if DEBUG:
 		content = (
-			Term.CURSOR_SAVE + Term.CURSOR_HIDE
-			+ bar_string
-			+ Term.CURSOR_LOAD + Term.CURSOR_SHOW + Term.RESET
+			Term.style_format("<lime>|START BAR =>")
+			+ content.replace("\x1b", Term.style_format("<orange>ESC"))
+			+ Term.style_format("<lime>|\<= END BAR")
+			+ "\n"*4
 		)
 
-		if DEBUG:
-			content = (
-				Term.style_format("<lime>|START BAR =>")
-				+ content.replace("\x1b", Term.style_format("<orange>ESC"))
-				+ Term.style_format("<lime>|\<= END BAR")
-				+ "\n"*4
-			)
-
-		utils.out(content, file=sys.stdout.original)
+	with utils.Stdout.lock:
+		backend.write(content)
 
 
 
@@ -404,6 +702,7 @@ def animate(bar: PBar, rng: range = range(100), delay: float = 0.05) -> None:
 	for _ in rng:
 		bar.step(steps)
 		sleep(delay)
+	bar._draw_pending()
 
 
 def iter(
@@ -415,7 +714,7 @@ def iter(
 ) -> Generator[T, None, None]:
 	"""
 	Yield all the values of the given iterable, while stepping
-	the progress bar/s.
+	the progress bar/s. All the bars are drawn together with a single write.
 	@iterable: Iterable object to iterate.
 	@bars: PBar objects to use.
 	@length: Length of the object to iterate.
@@ -427,20 +726,26 @@ def iter(
 	if not bars:
 		bars = (PBar(), )
 
+	bar_group = group.BarGroup(*bars)
+
 	for bar in bars:
 		bar.prange = (0, (length or len(iterable)))
-		bar.draw()
-
-	for x in iterable:
-		yield x
-		for bar in bars:
-			if set_title:
-				bar.text = str(x)
-			bar.step()
-
-	if clear:
+	bar_group.draw()
+
+	cleared = False
+	try:
+		for x in iterable:
+			yield x
+			bar_group.step(text=str(x) if set_title else None)
+
+		if clear:
+			bar_group.clear()
+			cleared = True
+	finally:
+		if not cleared:
+			bar_group._draw_pending()	# show the last step, even if the loop was stopped early
 		for bar in bars:
-			bar.clear()
+			bar_group.remove(bar)
 
 
 def bar_helper(bar: PBar = None) -> tuple[tuple[int, int], tuple[int, int]]:
@@ -1,7 +1,10 @@
+from bisect import bisect_left, bisect_right, insort
+from operator import ne, gt, ge, lt, le
 from shlex import split as str_split
-from typing import Callable
+from typing import Any, Callable, Optional, Sequence, Union
 
 from . import bar, sets, utils, gen
+from . sets import BarAttrGetter
 
 
 _OPERATORS = {
@@ -14,9 +17,39 @@ _OPERATORS = {
 	"IN": "<-",
 }
 
+_COMPARISONS: dict[str, Callable[[Any, float], bool]] = {
+	_OPERATORS["NE"]: ne,
+	_OPERATORS["GT"]: gt,
+	_OPERATORS["GE"]: ge,
+	_OPERATORS["LT"]: lt,
+	_OPERATORS["LE"]: le,
+}
+
+
+def _parse_float(value: str) -> Optional[float]:
+	"""Return the value as a float, or `None` if it is not a number."""
+	try:
+		return float(value)
+	except (ValueError, TypeError):
+		return None
+
+
+def _parse_range(value: str) -> range:
+	"""Parse a range with the `{start[..end][..step]}` syntax."""
+	range_splitted = value[1:-1].split("..")
+	utils.chk_seq_of_len(range_splitted, range(1, 4), "Cond_range")
+	return range(*map(int, range_splitted))
+
+
+
 
 class Cond:
 	"""Condition manager used by a PBar object."""
+	__slots__ = (
+		"_attribute", "_operator", "_value", "new_sets", "contentg",
+		"callback", "times", "_getter", "_threshold", "_test"
+	)
+
 	def __init__(self,
 		condition: str,
 		*,
@@ -72,6 +105,9 @@ class Cond:
 		self.contentg = contentg
 		self.callback = callback
 		self.times = times
+		self._getter = sets.FormatSet.get_attr_getter(self._attribute)
+		self._threshold: Optional[float] = None	# number that the attribute is compared with, if any. (see `CondIndex`)
+		self._test = self._compile()
 
 
 	@staticmethod
@@ -97,40 +133,54 @@ class Cond:
 
 	def test(self, bar_obj: "bar.PBar") -> bool:
 		"""Check if the condition succeeds with the values of the PBar object"""
-		operator = self._operator
-		cond_value, bar_value = self._value, sets.FormatSet.get_bar_attr(bar_obj, self._attribute)
+		return self._test(bar_obj)
 
-		if is_checking_range := ( # whether we are checking a number in a range
-			isinstance(cond_value, str)
-			and cond_value.startswith("{") and cond_value.endswith("}")
-			and utils.is_num(bar_value)
-		):
-			range_splitted = cond_value[1:-1].split("..")
-			utils.chk_seq_of_len(range_splitted, range(1, 4), "Cond_range")
-			cond_value = range(*map(int, range_splitted))
-
-		# we use lambdas because some values may not be compatible with some operators
-		operators: dict[str, Callable] = {
-			_OPERATORS["EQ"]: lambda: bar_value == (float(cond_value) if utils.is_num(cond_value) else cond_value),
-			_OPERATORS["NE"]: lambda: bar_value != float(cond_value),
-			_OPERATORS["GT"]: lambda: bar_value > float(cond_value),
-			_OPERATORS["GE"]: lambda: bar_value >= float(cond_value),
-			_OPERATORS["LT"]: lambda: bar_value < float(cond_value),
-			_OPERATORS["LE"]: lambda: bar_value <= float(cond_value),
-			_OPERATORS["IN"]: lambda: (
-				bar_value in cond_value
-				if is_checking_range else
-				str(cond_value) in bar_value.lower()
-			),
-		}
-
-		return operators.get(operator, lambda: False)()
 
+	def _compile(self) -> Callable[["bar.PBar"], bool]:
+		"""
+		Return a function that checks the condition with a PBar object.
+		The value of the condition and the getter of the attribute are only parsed once here.
+		"""
+		operator, cond_value, getter = self._operator, self._value, self._getter
+		number = _parse_float(cond_value)
 
-	def chk_and_apply(self, bar_obj: "bar.PBar") -> None:
-		"""Apply the new sets and run the callback if the condition succeeds"""
-		if not self.test(bar_obj) or self.times <= 0:
-			return
+		if number is not None and number == number and operator != _OPERATORS["IN"]:	# NaN can't be sorted
+			self._threshold = number
+
+		if operator == _OPERATORS["IN"]:
+			if not (cond_value.startswith("{") and cond_value.endswith("}")):
+				return lambda bar_obj: cond_value in getter(bar_obj).lower()
+
+			try:
+				cond_range = _parse_range(cond_value)
+			except (ValueError, TypeError):
+				cond_range = None	# invalid, but only if the attribute is a number. Raise the error when checking
+
+			def test_in(bar_obj: "bar.PBar") -> bool:
+				bar_value = getter(bar_obj)
+				if utils.is_num(bar_value):	# whether we are checking a number in a range
+					return bar_value in (cond_range if cond_range is not None else _parse_range(cond_value))
+				return cond_value in bar_value.lower()
+			return test_in
+
+		if operator == _OPERATORS["EQ"]:
+			expected = number if number is not None else cond_value
+			return lambda bar_obj: getter(bar_obj) == expected
+
+		if number is None:	# the rest of the operators need a number
+			def test_invalid(bar_obj: "bar.PBar") -> bool:
+				getter(bar_obj)
+				raise ValueError(f"could not convert string to float: {cond_value!r}")
+			return test_invalid
+
+		compare = _COMPARISONS[operator]
+		return lambda bar_obj: compare(getter(bar_obj), number)
+
+
+	def chk_and_apply(self, bar_obj: "bar.PBar") -> bool:
+		"""Apply the new sets and run the callback if the condition succeeds. Return `True` if it did."""
+		if self.times == 0 or not self._test(bar_obj):
+			return False
 
 		if self.new_sets[0]:	bar_obj.colorset = self.new_sets[0]
 		if self.new_sets[1]:	bar_obj.charset = self.new_sets[1]
@@ -142,4 +192,76 @@ class Cond:
 
 		# subtract 1 from `times` after each successful check
 		if self.times > 0:
-			self.times -= 1
\ No newline at end of file
+			self.times -= 1
+
+		return True
+
+
+
+
+class CondIndex:
+	"""
+	Conditions of a bar, indexed so that each time the bar is drawn only the conditions that may succeed are checked.
+
+	A condition that compares an attribute with a number can only change its result when the value of
+	the attribute crosses that number. While these conditions fail, they are kept sorted by their number
+	for each attribute, and they are only checked again when the attribute moves past their number.
+	The rest of the conditions are checked every time.
+	"""
+	def __init__(self, conditions: Sequence[Cond]) -> None:
+		self.conditions = tuple(conditions)
+		self._pending = set(range(len(self.conditions)))	# conditions to check the next time
+		self._failing: dict[BarAttrGetter, list[tuple[float, int]]] = {}	# (threshold, index) of the failing conditions
+		self._values: dict[BarAttrGetter, Union[int, float]] = {}	# values of the attributes when the conditions failed
+
+
+	def chk_and_apply(self, bar_obj: "bar.PBar") -> None:
+		"""Check the conditions that may succeed now, in order, applying the ones that do."""
+		to_check, values = self._pending, self._values
+
+		for getter, failing in self._failing.items():
+			if (value := getter(bar_obj)) == (old_value := values[getter]):
+				continue
+			low, high = (old_value, value) if old_value < value else (value, old_value)
+			start = bisect_left(failing, (low, -1))
+			stop = bisect_right(failing, (high, len(self.conditions)))
+			to_check.update(index for _, index in failing[start:stop])
+			del failing[start:stop]
+			values[getter] = value
+
+		self._pending = set()
+		reset = False
+		for index in sorted(to_check):
+			condition = self.conditions[index]
+			if condition.chk_and_apply(bar_obj):
+				self._pending.add(index)
+				reset = reset or condition.callback is not None
+			else:
+				self._add_failing(bar_obj, index)
+
+		if reset:	# the callbacks may have changed anything, so check everything again the next time
+			self._reset()
+
+
+	def _add_failing(self, bar_obj: "bar.PBar", index: int) -> None:
+		"""Index a condition that failed, so it's only checked again when its attribute crosses its number."""
+		condition = self.conditions[index]
+		getter, threshold = condition._getter, condition._threshold
+		value = getter(bar_obj)
+
+		if (
+			threshold is None or condition.times == 0	# exhausted conditions don't even run their test
+			or not isinstance(value, (int, float))
+			or self._values.setdefault(getter, value) != value
+		):
+			self._pending.add(index)
+			return
+
+		insort(self._failing.setdefault(getter, []), (threshold, index))
+
+
+	def _reset(self) -> None:
+		"""Check all the conditions the next time."""
+		self._pending = set(range(len(self.conditions)))
+		self._failing.clear()
+		self._values.clear()
@@ -1,11 +1,12 @@
-import sys
 from typing import Callable, Optional
 
 from . import sets, utils, bar
+from . backend import get_backend
 from . utils import Term, cap_value
 
 
 BContentGen = Callable[["BContentGenMgr"], str]
+Area = tuple[tuple[int, int], tuple[int, int]]	# position and size of a rectangle
 
 
 def b_shape(
@@ -32,21 +33,21 @@ def b_shape(
 
 
 	top: str = (
-		Term.set_pos(position)
+		Term._pos_seq(*position)
 		+ char_corner[0]
 		+ parsed_colorset["horiz"]["top"] + char_horiz[0]*width
 		+ char_corner[1]
 	)
 
-	mid: str = "".join((	# generate all the rows of the bar. If filled is None, we just make the cursor jump to the right
-		Term.set_pos(position, (0, row+1))
-		+ char_vert[0]
-		+ (Term.move_horiz(width) if filled is None else filled[0]*width)
-		+ char_vert[1]
-	) for row in range(height - 1))
+	# generate all the rows of the bar. If filled is None, we just make the cursor jump to the right
+	row_body = char_vert[0] + (Term.move_horiz(width) if filled is None else filled[0]*width) + char_vert[1]
+	mid: str = "".join(
+		row_start + row_body
+		for row_start in Term._row_starts(position[0], position[1] + 1, height - 1)
+	)
 
 	bottom: str = (
-		Term.set_pos(position, (0, height))
+		Term._pos_seq(position[0], position[1] + height)
 		+ char_corner[2]
 		+ parsed_colorset["horiz"]["bottom"] + char_horiz[1]*width
 		+ char_corner[3]
@@ -111,10 +112,7 @@ def iter_rows(string: str, pos: tuple[int, int], height: tuple[int, int]) -> str
 	for each row.
 	Automatically positions the cursor at the beginning of each row.
 	"""
-	return "".join((
-		Term.set_pos(pos, (0, row))
-		+ string
-	) for row in range(height))
+	return "".join(row_start + string for row_start in Term.row_starts(pos, height))
 
 
 def rect(
@@ -125,8 +123,7 @@ def rect(
 	centered: bool = False
 ) -> str:
 	"""Generate a rectangle."""
-	size = get_computed_size(size, (0, 0))
-	pos = get_computed_position(pos, size, (-1, -1), centered)
+	pos, size = rect_area(pos, size, centered)
 
 	if color and "\x1b" not in color:		# if it is already a terminal sequence, dont need to parse
 		color = Term.color(color)
@@ -138,6 +135,51 @@ def rect(
 	)
 
 
+def rect_area(
+	pos: "bar.Position",
+	size: tuple[int, int],
+	centered: bool = False
+) -> Area:
+	"""Return the computed position and size of a rectangle generated with `rect`."""
+	size = get_computed_size(size, (0, 0))
+	return get_computed_position(pos, size, (-1, -1), centered), size
+
+
+def _interval_diff(start: int, stop: int, other_start: int, other_stop: int) -> tuple[tuple[int, int], ...]:
+	"""Return the parts of the interval `[start, stop)` that are not in `[other_start, other_stop)`."""
+	if other_start >= other_stop or other_stop <= start or other_start >= stop:
+		return ((start, stop), ) if start < stop else ()
+	return tuple(
+		(a, b) for a, b in ((start, min(stop, other_start)), (max(start, other_stop), stop)) if a < b
+	)
+
+
+def rect_delta(
+	old: Area, new: Area,
+	char_in: str, color_in: str,
+	char_out: str, color_out: str
+) -> str:
+	"""
+	Generate only the cells that change when a rectangle moves from the area `old` to the area `new`.
+	The cells that are now inside the rectangle are drawn with `char_in`, and the ones that are not
+	anymore with `char_out`. (Areas are tuples of a position and a size, like the ones returned by `rect_area`)
+	"""
+	(old_x, old_y), (old_w, old_h) = old
+	(new_x, new_y), (new_w, new_h) = new
+	parts: list[str] = []
+
+	for y in range(min(old_y, new_y), max(old_y + old_h, new_y + new_h)):
+		old_row = (old_x, old_x + old_w) if old_y <= y < old_y + old_h else (0, 0)
+		new_row = (new_x, new_x + new_w) if new_y <= y < new_y + new_h else (0, 0)
+
+		for start, stop in _interval_diff(*new_row, *old_row):
+			parts.append(Term._pos_seq(start, y) + color_in + char_in*(stop - start))
+		for start, stop in _interval_diff(*old_row, *new_row):
+			parts.append(Term._pos_seq(start, y) + color_out + char_out*(stop - start))
+
+	return "".join(parts)
+
+
 def get_computed_position(
 	position: "bar.Position",
 	c_size: tuple[int, int],
@@ -148,7 +190,7 @@ def get_computed_position(
 	Return a computed position based on the given position and size,
 	and the size of the terminal.
 	"""
-	term_size = Term.get_size()
+	term_size = get_backend().get_size()
 	newpos = list(position)
 
 	for index, value in enumerate(position):
@@ -156,7 +198,7 @@ def get_computed_position(
 			if value.startswith("c"):
 				value = term_size[index]//2 + int(value[1:]) if value[1:] else term_size[index]//2
 			elif value.startswith("r"):
-				cursor_pos = Term.get_pos(file=sys.stdout.original)
+				cursor_pos = get_backend().get_pos()
 				value = cursor_pos[index] + int(value[1:]) if value[1:] else cursor_pos[index]
 			else:
 				raise ValueError("Invalid position value")
@@ -185,7 +227,7 @@ def get_computed_size(
 	min_size: tuple[int, int] = (0, 0)
 ) -> tuple[int, int]:
 	"""Return a computed size based on the given size, and the size of the terminal."""
-	term_size = Term.get_size()
+	term_size = get_backend().get_size()
 	newsize = list(size)
 
 	for index in range(2):	# yields 0 and 1
@@ -232,13 +274,22 @@ class BContentGenMgr:
 	- `segments_empty`: The number of segments used to fill the empty space of the bar.
 		- `segments_empty[0]`: Horizontal segments.
 		- `segments_empty[1]`: Vertical segments.
+	- `prev_segments_full`, `prev_segments_empty`: The segments of the previous frame drawn, or `None`.
+	Used by incremental generators.
 
 	### Methods
 
 	- `iter_rows()`: Iterate throught the rows of the bar height.
 	Automatically positions the cursor at the beginning of each row.
 	- `fill()`: Fill the bar with the given string.
+	- `delta()`: Generate only the cells that changed since the previous frame.
 	"""
+	__slots__ = (
+		"contentg", "prange", "position", "pos_x", "pos_y", "size", "width", "height",
+		"char_full", "char_empty", "color_full", "color_empty",
+		"segments_full", "segments_empty", "prev_segments_full", "prev_segments_empty"
+	)
+
 	def __init__(self,
 		contentg: BContentGen,
 		invert: bool,
@@ -246,12 +297,27 @@ class BContentGenMgr:
 		size: tuple[int, int],
 		charset: sets.CharSet,
 		parsed_colorset,
-		prange: tuple[int, int]
+		prange: tuple[int, int],
+		prev_prange: Optional[tuple[int, int]] = None
 	) -> None:
 		"""
 		@contentg: Bar content generator.
 		@invert: Invert the chars and colors of the bar.
+		@prev_prange: The prange of the previous frame drawn, if the content of the bar is already on screen.
 		"""
+		self.update(contentg, invert, position, size, charset, parsed_colorset, prange, prev_prange)
+
+	def update(self,
+		contentg: BContentGen,
+		invert: bool,
+		position: tuple[int, int],
+		size: tuple[int, int],
+		charset: sets.CharSet,
+		parsed_colorset,
+		prange: tuple[int, int],
+		prev_prange: Optional[tuple[int, int]] = None
+	) -> None:
+		"""Set the properties of a new frame, so the same object can be reused."""
 		self.contentg = contentg
 		self.prange = prange
 
@@ -267,18 +333,41 @@ class BContentGenMgr:
 		self.color_full, self.color_empty = (
 			parsed_colorset[set_entry[0]], parsed_colorset[set_entry[1]])
 
-		self.segments_full = (
+		self.segments_full, self.segments_empty = self._get_segments(prange)
+		self.prev_segments_full, self.prev_segments_empty = (
+			self._get_segments(prev_prange) if prev_prange is not None else (None, None)
+		)
+
+	def _get_segments(self, prange: tuple[int, int]) -> tuple[tuple[int, int], tuple[int, int]]:
+		"""Return the full and empty segments of the bar for the prange supplied."""
+		segments_full = (
 			int((prange[0] / prange[1])*self.width),
 			int(cap_value((prange[0] / prange[1])*self.height, max=self.height))
 		)
-		self.segments_empty = (
-			self.width - self.segments_full[0],
-			cap_value(self.height - self.segments_full[1], min=0)
+		segments_empty = (
+			self.width - segments_full[0],
+			cap_value(self.height - segments_full[1], min=0)
 		)
+		return segments_full, segments_empty
 
 	def __call__(self) -> str:
 		"""Generate the content of the bar."""
-		return Term.set_pos(self.position) + self.contentg(self)
+		return Term._pos_seq(*self.position) + self.contentg(self)
+
+	def delta(self) -> Optional[str]:
+		"""
+		Generate only the cells of the content that changed since the previous frame.
+		Returns `None` if the generator has no incremental version, or if there is no previous frame.
+		"""
+		incremental = getattr(self.contentg, "incremental", None)
+		if (
+			incremental is None or self.prev_segments_full is None
+			or len(self.char_full) != 1 or len(self.char_empty) != 1
+		):
+			return None
+		if self.prev_segments_full == self.segments_full:
+			return ""
+		return incremental(self)
 
 	def iter_rows(self, string: str):
 		"""
@@ -286,7 +375,10 @@ class BContentGenMgr:
 		string on each.
 		Automatically positions the cursor at the beginning of each row.
 		"""
-		return iter_rows(string, self.position, self.height)
+		return "".join(
+			row_start + string
+			for row_start in Term._row_starts(*self.position, self.height)
+		)
 
 	def fill(self, string: str):
 		"""Fill the bar with the given string multiplied by the width of the bar."""
@@ -341,6 +433,19 @@ class ContentGens:
 
 		return inner(generator)
 
+	@staticmethod
+	def register_incremental(generator: BContentGen, incremental: BContentGen) -> BContentGen:
+		"""
+		Register the incremental version of a generator. The incremental version
+		must only generate the cells that changed from `prev_segments_full` to `segments_full`,
+		so bars that only change their progress don't need to generate all their content again.
+
+		@generator: The generator to register the incremental version of.
+		@incremental: The incremental version.
+		"""
+		setattr(generator, "incremental", incremental)
+		return generator
+
 	@staticmethod
 	def get_gens() -> tuple[BContentGen]:
 		"""Get the registered generators."""
@@ -350,6 +455,26 @@ class ContentGens:
 		)
 
 
+def rect_incremental(
+	area: Callable[[BContentGenMgr, tuple[int, int], tuple[int, int]], Area],
+	inside_full: bool = True
+) -> BContentGen:
+	"""
+	Return an incremental generator for generators that fill the bar, and then draw a rectangle on top.
+	@area: Function that returns the area of the rectangle with the bar, and the full and empty segments supplied.
+	@inside_full: The rectangle is drawn with the full character. Otherwise, with the empty one.
+	"""
+	def incremental(bar: BContentGenMgr) -> str:
+		full, empty = (bar.char_full, bar.color_full), (bar.char_empty, bar.color_empty)
+		return rect_delta(
+			area(bar, bar.prev_segments_full, bar.prev_segments_empty),
+			area(bar, bar.segments_full, bar.segments_empty),
+			*(full + empty if inside_full else empty + full)
+		)
+
+	return incremental
+
+
 # ------------------------- Default content generators -------------------------
 
 
@@ -362,6 +487,10 @@ def auto(bar: BContentGenMgr) -> str:
 		bottom(bar)
 	)
 
+ContentGens.register_incremental(auto, lambda bar: (
+	left if bar.width//2 > bar.height else bottom
+).incremental(bar))
+
 @ContentGens.register
 def left(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the left."""
@@ -370,6 +499,10 @@ def left(bar: BContentGenMgr) -> str:
 		+ bar.color_empty + bar.char_empty*bar.segments_empty[0]
 	)
 
+ContentGens.register_incremental(left, rect_incremental(
+	lambda bar, full, empty: ((bar.pos_x, bar.pos_y), (full[0], bar.height))
+))
+
 @ContentGens.register
 def right(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the right."""
@@ -378,6 +511,10 @@ def right(bar: BContentGenMgr) -> str:
 		+ bar.color_full + bar.char_full*bar.segments_full[0]
 	)
 
+ContentGens.register_incremental(right, rect_incremental(
+	lambda bar, full, empty: ((bar.pos_x + empty[0], bar.pos_y), (full[0], bar.height))
+))
+
 @ContentGens.register
 def center_x(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the center on the X axis."""
@@ -392,6 +529,12 @@ def center_x(bar: BContentGenMgr) -> str:
 		)
 	)
 
+ContentGens.register_incremental(center_x, rect_incremental(
+	lambda bar, full, empty: rect_area(
+		(bar.pos_x + bar.width/2, bar.pos_y + bar.height/2), (full[0], bar.height), True
+	)
+))
+
 @ContentGens.register
 def top(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the top."""
@@ -405,6 +548,11 @@ def top(bar: BContentGenMgr) -> str:
 		)
 	)
 
+ContentGens.register_incremental(top, rect_incremental(
+	lambda bar, full, empty: rect_area((bar.pos_x, bar.pos_y + full[1]), (bar.width, empty[1])),
+	inside_full=False
+))
+
 @ContentGens.register
 def bottom(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the bottom."""
@@ -418,6 +566,10 @@ def bottom(bar: BContentGenMgr) -> str:
 		)
 	)
 
+ContentGens.register_incremental(bottom, rect_incremental(
+	lambda bar, full, empty: rect_area((bar.pos_x, bar.pos_y + empty[1]), (bar.width, full[1]))
+))
+
 @ContentGens.register
 def center_y(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the center on the Y axis."""
@@ -432,6 +584,12 @@ def center_y(bar: BContentGenMgr) -> str:
 		)
 	)
 
+ContentGens.register_incremental(center_y, rect_incremental(
+	lambda bar, full, empty: rect_area(
+		(bar.pos_x + bar.width/2, bar.pos_y + bar.height/2), (bar.width, full[1]), True
+	)
+))
+
 @ContentGens.register
 def top_left(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the top left."""
@@ -445,6 +603,10 @@ def top_left(bar: BContentGenMgr) -> str:
 		)
 	)
 
+ContentGens.register_incremental(top_left, rect_incremental(
+	lambda bar, full, empty: rect_area(bar.position, full)
+))
+
 @ContentGens.register
 def top_right(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the top right."""
@@ -461,6 +623,10 @@ def top_right(bar: BContentGenMgr) -> str:
 		)
 	)
 
+ContentGens.register_incremental(top_right, rect_incremental(
+	lambda bar, full, empty: rect_area((bar.pos_x + empty[0], bar.pos_y), full)
+))
+
 @ContentGens.register
 def bottom_left(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the bottom left."""
@@ -477,6 +643,10 @@ def bottom_left(bar: BContentGenMgr) -> str:
 		)
 	)
 
+ContentGens.register_incremental(bottom_left, rect_incremental(
+	lambda bar, full, empty: rect_area((bar.pos_x, bar.pos_y + empty[1]), full)
+))
+
 @ContentGens.register
 def bottom_right(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the bottom right."""
@@ -493,6 +663,10 @@ def bottom_right(bar: BContentGenMgr) -> str:
 		)
 	)
 
+ContentGens.register_incremental(bottom_right, rect_incremental(
+	lambda bar, full, empty: rect_area((bar.pos_x + empty[0], bar.pos_y + empty[1]), full)
+))
+
 @ContentGens.register
 def center(bar: BContentGenMgr) -> str:
 	"""Generate the content of a bar from the center."""
@@ -508,4 +682,10 @@ def center(bar: BContentGenMgr) -> str:
 			bar.color_full,
 			True
 		)
-	)
\ No newline at end of file
+	)
+
+ContentGens.register_incremental(center, rect_incremental(
+	lambda bar, full, empty: rect_area(
+		(bar.pos_x + bar.width/2, bar.pos_y + bar.height/2), full, True
+	)
+))
@@ -0,0 +1,140 @@
+import sys
+from itertools import chain
+from typing import Optional, Sequence, SupportsInt
+
+from . import bar, utils
+
+
+
+class BarGroup:
+	"""
+	Group of bars that are drawn together, with a single write to the terminal per frame.
+
+	The group also redraws its bars when the terminal scrolls, instead of each bar
+	doing it on its own.
+
+	>>> group = BarGroup(bar1, bar2, bar3)
+	>>> for _ in range(100):
+	...		group.step()
+	>>> group.clear()
+	"""
+	def __init__(self, *bars: "bar.PBar") -> None:
+		"""@bars: PBar objects to add to the group."""
+		self._bars: list["bar.PBar"] = []
+		for bar_obj in bars:
+			self.add(bar_obj)
+
+
+	@property
+	def bars(self) -> tuple["bar.PBar", ...]:
+		"""Bars in the group."""
+		return tuple(self._bars)
+
+
+	def add(self, bar_obj: "bar.PBar") -> None:
+		"""Add a bar to the group. A bar can only be in one group at a time."""
+		if bar_obj._group is not None:
+			raise RuntimeError("The bar is already in a group")
+		bar_obj._group = self
+		self._bars.append(bar_obj)
+		utils.Stdout.remove_trigger(bar_obj)	# the group redraws it now
+
+
+	def remove(self, bar_obj: "bar.PBar") -> None:
+		"""Remove a bar from the group."""
+		if bar_obj._group is self:
+			self._bars.remove(bar_obj)
+			bar_obj._group = None
+			if bar_obj._is_on_screen:
+				utils.Stdout.add_trigger(bar_obj)
+
+
+	def draw(self) -> None:
+		"""Draw all the bars of the group."""
+		with utils.Stdout.lock:
+			utils.Stdout.add_trigger(self)
+			bar._print_bars_str("".join(bar_obj._render() for bar_obj in self._bars))
+
+
+	def step(self, steps: int = 1, text: Optional[str] = None) -> None:
+		"""
+		Add `steps` to the first value in the prange of all the bars, then draw them
+		if any of them should be drawn.
+		@steps: Value to add to the first value in prange.
+		@text: Text to be displayed on the bars.
+		"""
+		if any([bar_obj._step(steps, text) for bar_obj in self._bars]):
+			self.draw()
+
+
+	def update(self, values: Sequence[SupportsInt]) -> None:
+		"""
+		Set the first value in the prange of each bar of the group, in order, and draw
+		the bars that changed with a single write. Use this to update many bars at once.
+
+		If NumPy is being used, the values are capped and compared in bulk with it.
+		@values: Progress of each bar. Any sequence of numbers, like a list, an `array.array` or a NumPy array.
+		"""
+		bars = self._bars
+		if len(values) != len(bars):
+			raise ValueError(f"Expected {len(bars)} values, got {len(values)}")
+
+		ranges = [bar_obj._range for bar_obj in bars]
+		if (numpy := sys.modules.get("numpy")) is not None:	# only if already imported, since it is slow to import
+			ranges_array = numpy.fromiter(
+				chain.from_iterable(ranges), dtype=numpy.int64, count=len(ranges)*2
+			).reshape(-1, 2)
+			stops = ranges_array[:, 1]
+			# capped before converting them to integers, since they may not fit in 64 bits
+			values_array = numpy.asarray(values, dtype=numpy.float64)
+			if numpy.isnan(values_array).any():
+				raise ValueError("cannot convert float NaN to integer")
+			starts = numpy.clip(values_array, 0, stops).astype(numpy.int64)
+			indices = numpy.flatnonzero(starts != ranges_array[:, 0])
+			changed = zip(indices.tolist(), starts[indices].tolist(), stops[indices].tolist())
+		else:
+			changed = []
+			for index, (value, (old_start, stop)) in enumerate(zip(values, ranges)):
+				if (start := int(min(max(value, 0), stop))) != old_start:
+					changed.append((index, start, stop))
+
+		with utils.Stdout.lock:
+			utils.Stdout.add_trigger(self)
+			strings = []
+			for index, start, stop in changed:
+				bar_obj = bars[index]
+				bar_obj._range = (start, stop)	# the values are already capped, no need to use the setter
+				if bar_obj._render_thread is not None:
+					bar_obj._scheduler.pending = True	# the render thread will draw it
+				else:
+					strings.append(bar_obj._render())
+
+			bar._print_bars_str("".join(strings))
+
+
+	def clear(self) -> None:
+		"""Clear all the bars of the group."""
+		for bar_obj in self._bars:
+			if bar_obj._render_thread is not None:
+				bar_obj._render_thread.remove(bar_obj)
+
+		with utils.Stdout.lock:
+			utils.Stdout.remove_trigger(self)
+			bar._print_bars_str("".join(bar_obj._render_clear() for bar_obj in self._bars))
+
+
+	def done(self, text: Optional[str] = None) -> None:
+		"""Set all the bars of the group to 100% and draw them."""
+		if any([bar_obj._set_done(text) for bar_obj in self._bars]):
+			self.draw()
+
+
+	def _draw_pending(self) -> None:
+		"""Draw the bars if any of them skipped any frames since the last one drawn."""
+		if any(bar_obj._scheduler.pending for bar_obj in self._bars):
+			self.draw()
+
+
+	def _redraw_with_offset(self, count: int) -> None:
+		with utils.Stdout.lock:
+			bar._print_bars_str("".join(bar_obj._render_with_offset(count) for bar_obj in self._bars))
@@ -0,0 +1,242 @@
+import os, sys, tempfile, threading
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from struct import pack_into, unpack_from
+from typing import Iterator, Optional
+
+from . import bar, group
+
+if sys.platform == "win32":
+	import ctypes, msvcrt
+else:
+	import fcntl
+
+
+# each slot has three 64 bit integers: the id of the process that owns it, the steps of
+# the processes that owned it before, and the steps of the current owner
+_SLOT_SIZE = 24
+
+# shared memory of the counters used by this process
+_attached: dict[str, shared_memory.SharedMemory] = {}
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+	"""Hold an exclusive lock on the file supplied. Works between processes, whichever way they were started."""
+	with open(path, "rb+") as file:
+		if sys.platform == "win32":
+			msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+		else:
+			fcntl.flock(file, fcntl.LOCK_EX)
+		try:
+			yield
+		finally:
+			if sys.platform == "win32":
+				file.seek(0)
+				msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+			# on the rest of the platforms, the lock is released when the file is closed
+
+
+def _is_alive(pid: int) -> bool:
+	"""Return `False` if the process with the id supplied has finished."""
+	if sys.platform == "win32":
+		kernel32 = ctypes.windll.kernel32
+		if not (handle := kernel32.OpenProcess(0x1000, False, pid)):	# PROCESS_QUERY_LIMITED_INFORMATION
+			return kernel32.GetLastError() == 5	# ERROR_ACCESS_DENIED: it exists, but it's not ours
+		exit_code = ctypes.c_ulong()
+		try:
+			return not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)) or exit_code.value == 259	# STILL_ACTIVE
+		finally:
+			kernel32.CloseHandle(handle)
+
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:	# it exists, but it's not ours
+		pass
+	return True
+
+
+
+
+class SharedCounter:
+	"""
+	Counter that can be incremented from multiple processes, like the workers
+	of a `ProcessPoolExecutor` or a `multiprocessing.Pool`.
+
+	The counter lives in shared memory, and it can be sent to the workers as an argument,
+	so there is no need to send the bar to them. Each process increments its own slot of
+	the counter, so incrementing it needs no locks. A process only takes a lock the first time,
+	to claim a free slot, or the slot of a process that finished. Use `Monitor` in the main
+	process to draw the progress.
+
+	>>> with SharedCounter() as counter, Monitor(counter, my_bar):
+	...		with ProcessPoolExecutor() as executor:
+	...			executor.map(work, repeat(counter), range(1000))
+
+	Note: The counter must be closed with `close()` by the process that created it.
+	"""
+	def __init__(self, slots: int = 64) -> None:
+		"""@slots: Maximum number of processes that can increment the counter at the same time."""
+		self._shm = shared_memory.SharedMemory(create=True, size=slots * _SLOT_SIZE)
+		self._shm.buf[:] = bytes(slots * _SLOT_SIZE)
+		fd, self._lock_path = tempfile.mkstemp(prefix="pbar-", suffix=".lock")	# locked to claim the slots
+		os.close(fd)
+		self._slots = slots
+		self._is_owner = True
+		self._slot: Optional[int] = None		# slot used by this process
+		self._slot_pid: Optional[int] = None	# process that claimed the slot (it changes after forking)
+		_attached[self._shm.name] = self._shm
+
+
+	def __getstate__(self) -> tuple[str, int, str]:
+		return self._shm.name, self._slots, self._lock_path
+
+
+	def __setstate__(self, state: tuple[str, int, str]) -> None:
+		name, slots, lock_path = state
+		# the memory is only mapped once per process, since a new counter is unpickled for each task
+		if (shm := _attached.get(name)) is None:
+			shm = _attached[name] = shared_memory.SharedMemory(name=name)
+
+		self._shm = shm
+		self._lock_path = lock_path
+		self._slots = slots
+		self._is_owner = False
+		self._slot = self._slot_pid = None
+
+
+	def __enter__(self) -> "SharedCounter":
+		return self
+
+
+	def __exit__(self, *_) -> None:
+		self.close()
+
+
+	def _get_slot(self) -> int:
+		"""Return the slot of this process, claiming one if needed."""
+		pid = os.getpid()
+		if self._slot is not None and self._slot_pid == pid:
+			return self._slot
+
+		buf, slots = self._shm.buf, self._slots
+		with _file_lock(self._lock_path):
+			owners = unpack_from(f"{slots * 3}q", buf)[::3]
+			if pid in owners:	# claimed before by another copy of the counter
+				slot = owners.index(pid)
+			elif 0 in owners:
+				slot = owners.index(0)
+				pack_into("q", buf, slot * _SLOT_SIZE, pid)
+			else:
+				# use the slot of a process that finished, moving its steps to the base of the slot
+				slot = next((slot for slot, owner in enumerate(owners) if not _is_alive(owner)), None)
+				if slot is None:
+					raise RuntimeError(f"All the {slots} slots of the counter are used by other processes")
+				_, base, count = unpack_from("3q", buf, slot * _SLOT_SIZE)
+				pack_into("3q", buf, slot * _SLOT_SIZE, pid, base + count, 0)
+
+		self._slot, self._slot_pid = slot, pid
+		return slot
+
+
+	def increment(self, steps: int = 1) -> None:
+		"""Add `steps` to the counter."""
+		offset = self._get_slot() * _SLOT_SIZE + 16
+		buf = self._shm.buf
+		pack_into("q", buf, offset, unpack_from("q", buf, offset)[0] + steps)
+
+
+	def _read(self) -> tuple[int, ...]:
+		"""Return the owner process id, base and count of all the slots."""
+		with _file_lock(self._lock_path):	# so a slot being claimed is never read half updated
+			return unpack_from(f"{self._slots * 3}q", self._shm.buf)
+
+
+	@property
+	def value(self) -> int:
+		"""Sum of the steps of all the processes."""
+		values = self._read()
+		return sum(values[1::3]) + sum(values[2::3])
+
+
+	@property
+	def process_values(self) -> tuple[int, ...]:
+		"""Steps of each process that is using a slot of the counter, in the order of their slots."""
+		values = self._read()
+		return tuple(values[i + 2] for i in range(0, len(values), 3) if values[i])
+
+
+	def close(self) -> None:
+		"""Destroy the shared memory. Only has effect in the process that created the counter."""
+		if self._is_owner and _attached.pop(self._shm.name, None) is not None:
+			self._shm.close()
+			self._shm.unlink()
+			os.remove(self._lock_path)
+
+
+
+
+class Monitor(threading.Thread):
+	"""
+	Thread that draws the progress of a `SharedCounter` in the main process.
+
+	The first value of the prange of the bar is set to the value of the counter,
+	while the second one is the total. Optionally, bars for each worker process
+	can be supplied, which will show the steps of each process.
+	"""
+	def __init__(
+		self,
+		counter: SharedCounter,
+		bar_obj: Optional["bar.PBar"] = None,
+		*process_bars: "bar.PBar",
+		fps: float = 10
+	) -> None:
+		"""
+		@counter: Counter to show.
+		@bar_obj: Bar that shows the value of the counter.
+		@process_bars: Bars that show the steps of each process, in the order of their slots.
+		@fps: Number of times per second that the bars will be drawn.
+		"""
+		super().__init__(name="pbar-monitor", daemon=True)
+		self.counter = counter
+		self.bar = bar_obj or bar.PBar()
+		self.process_bars = process_bars
+		self.fps = fps
+		self._group = group.BarGroup(self.bar, *process_bars)
+		self._stop_event = threading.Event()
+
+
+	def __enter__(self) -> "Monitor":
+		self.start()
+		return self
+
+
+	def __exit__(self, *_) -> None:
+		self.stop()
+
+
+	def run(self) -> None:
+		self.update()
+		while not self._stop_event.wait(1 / self.fps):
+			self.update()
+
+
+	def update(self) -> None:
+		"""Set the values of the counter to the bars and draw them."""
+		self.bar.prange = (self.counter.value, self.bar.prange[1])
+		for bar_obj, value in zip(self.process_bars, self.counter.process_values):
+			bar_obj.prange = (value, bar_obj.prange[1])
+		self._group.draw()
+
+
+	def stop(self) -> None:
+		"""Stop the thread, drawing the final values."""
+		self._stop_event.set()
+		if self.is_alive():
+			self.join()
+		self.update()
+
+		for bar_obj in self._group.bars:
+			self._group.remove(bar_obj)
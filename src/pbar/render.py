@@ -0,0 +1,387 @@
+import re, threading
+from itertools import repeat
+from time import perf_counter
+from typing import Hashable, Optional
+
+from . import bar, utils
+from . utils import Term
+
+
+
+# matches a CSI sequence, any other escape sequence, or a run of printable characters.
+# CSI sequences with intermediate characters (like "\x1b[1;-5f") are ignored by terminals, so we do the same
+_TOKEN = re.compile(r"\x1b\[([0-?]*)([ -/][ -?]*)?([@-~])|\x1b(.)|([^\x1b]+)", re.DOTALL)
+
+Style = tuple[str, str]		# (attributes and background, foreground)
+Cell = tuple[str, str, str]	# (attributes and background, foreground, character)
+
+_BLANK: Cell = ("", "", " ")
+_MOVES = frozenset("fHABCD")
+
+
+
+
+class Frame:
+	"""
+	Grid of cells generated by interpreting a string that contains
+	cursor positioning and color sequences. (The output of `PBar._gen_bar`)
+
+	Two frames can be compared with `diff()` to get a string that only
+	redraws the cells that changed between them.
+	"""
+	def __init__(self, string: str = "") -> None:
+		self.rows: dict[int, dict[int, Cell]] = {}
+		if string:
+			self.overlay(string)
+
+
+	def __eq__(self, other: object) -> bool:
+		return isinstance(other, Frame) and self.rows == other.rows
+
+
+	def overlay(self, string: str) -> None:
+		"""Draw the string supplied on top of the cells of this frame."""
+		rows = self.rows
+		x = y = 1
+		extra = fg = ""
+
+		for csi_params, csi_ignored, csi_cmd, _, text in _TOKEN.findall(string):
+			if text:
+				row = rows.get(y)
+				if row is None:
+					row = rows[y] = {}
+				row.update(zip(
+					range(x, x + len(text)),
+					zip(repeat(extra), repeat(fg), text)
+				))
+				x += len(text)
+			elif csi_ignored:
+				continue
+			elif csi_cmd == "m":
+				if not csi_params or csi_params == "0":
+					extra = fg = ""
+				elif csi_params.startswith("38"):
+					fg = f"\x1b[{csi_params}m"
+				else:
+					extra += f"\x1b[{csi_params}m"
+			elif csi_cmd in _MOVES:
+				x, y = Frame._move((x, y), csi_params, csi_cmd)
+
+
+	@staticmethod
+	def _move(pos: tuple[int, int], params: str, cmd: str) -> tuple[int, int]:
+		"""Return the new cursor position after a CSI movement sequence."""
+		x, y = pos
+		if cmd in "fH":
+			row, _, col = params.partition(";")
+			return max(int(col or 1), 1), max(int(row or 1), 1)
+
+		dist = int(params or 1)
+		if cmd == "A":	return x, max(y - dist, 1)
+		if cmd == "B":	return x, y + dist
+		if cmd == "C":	return x + dist, y
+		if cmd == "D":	return max(x - dist, 1), y
+		return x, y
+
+
+	def diff(self, new: "Frame") -> str:
+		"""
+		Return a string that converts the cells of this frame into the cells of the `new` frame.
+		Cells that are not present in the new frame are cleared.
+		"""
+		old_rows, new_rows = self.rows, new.rows
+		changes: dict[int, dict[int, Cell]] = {}
+
+		for y in old_rows.keys() | new_rows.keys():
+			old_row, new_row = old_rows.get(y, {}), new_rows.get(y, {})
+			if old_row == new_row:
+				continue
+
+			changed = {x: cell for x, cell in new_row.items() if old_row.get(x) != cell}
+			changed.update((x, _BLANK) for x in old_row.keys() - new_row.keys())
+			changes[y] = changed
+
+		return Frame._draw_cells(changes)
+
+
+	@staticmethod
+	def _draw_cells(cells: dict[int, dict[int, Cell]]) -> str:
+		"""Return a string that draws the cells supplied, positioning the cursor only where needed."""
+		output: list[str] = []
+		style: Optional[Style] = None
+
+		for y in sorted(cells):
+			row = cells[y]
+			next_x = None
+			for x in sorted(row):
+				extra, fg, char = row[x]
+				if x != next_x:
+					output.append(Term._pos_seq(x, y))
+				if style != (extra, fg):
+					output.append(
+						fg if style is not None and style[0] == extra and fg
+						else Term.RESET + extra + fg
+					)
+					style = (extra, fg)
+				output.append(char)
+				next_x = x + 1
+
+		return "".join(output)
+
+
+
+
+class Layers:
+	"""
+	Cells of a bar split in the layers it is made of: the shape, the content and the text (on top).
+	When only the progress or the text of the bar change, the screen can be updated
+	with just the cells of the content that changed, instead of generating and comparing the whole bar.
+	"""
+	def __init__(self, key: Hashable, prange: tuple[int, int], shape: str, content: str, text: str) -> None:
+		"""
+		@key: Value that identifies everything that was used to generate the layers, apart from the progress and the text.
+		@prange: The prange of the bar when the content was generated.
+		"""
+		self.key = key
+		self.prange = prange
+		self.shape, self.content, self.text = Frame(shape), Frame(content), Frame(text)
+		self._text_string = text
+
+		self.screen = Frame()	# all the layers combined
+		rows = self.screen.rows
+		for layer in (self.shape, self.content, self.text):
+			for y, row in layer.rows.items():
+				rows.setdefault(y, {}).update(row)
+
+
+	def update(self, prange: tuple[int, int], content_delta: str, text: str) -> str:
+		"""
+		Draw the cells of the content that changed, and the new text on the screen.
+		Return the string that updates the cells that changed.
+		@prange: The new prange of the bar.
+		@content_delta: String that only draws the cells of the content that changed.
+		@text: The new text layer.
+		"""
+		self.prange = prange
+		dirty: dict[int, set[int]] = {}
+
+		for y, row in Frame(content_delta).rows.items():
+			self.content.rows.setdefault(y, {}).update(row)
+			dirty.setdefault(y, set()).update(row)
+
+		if text != self._text_string:
+			old_text, self.text, self._text_string = self.text, Frame(text), text
+			for layer in (old_text, self.text):
+				for y, row in layer.rows.items():
+					dirty.setdefault(y, set()).update(row)
+
+		screen_rows, changes = self.screen.rows, {}
+		for y, xs in dirty.items():
+			layer_rows = (self.text.rows.get(y, {}), self.content.rows.get(y, {}), self.shape.rows.get(y, {}))
+			screen_row = screen_rows.setdefault(y, {})
+			changed = {}
+			for x in xs:
+				cell = layer_rows[0].get(x) or layer_rows[1].get(x) or layer_rows[2].get(x)
+				if cell is None:
+					if screen_row.pop(x, None) is not None:
+						changed[x] = _BLANK
+				elif screen_row.get(x) != cell:
+					screen_row[x] = changed[x] = cell
+			if changed:
+				changes[y] = changed
+			if not screen_row:
+				del screen_rows[y]
+
+		return Frame._draw_cells(changes)
+
+
+
+
+class Scheduler:
+	"""
+	Decides if a bar should be drawn after being stepped, so that many steps
+	done in a short amount of time are coalesced into a single frame.
+	"""
+	__slots__ = ("max_fps", "min_delta", "pending", "_last_time", "_last_state")
+
+	def __init__(self, max_fps: Optional[float] = None, min_delta: float = 0) -> None:
+		"""
+		@max_fps: Maximum number of frames per second. `None` or `0` disables the limit.
+		@min_delta: Minimum change of the percentage of the bar required to draw a new frame.
+		"""
+		self.max_fps = max_fps
+		self.min_delta = min_delta
+		self.pending = False	# Were any frames skipped since the last one drawn?
+		self._last_time = float("-inf")
+		self._last_state: Optional[tuple[float, str]] = None
+
+
+	def should_draw(self, percentage: float, text: str, force: bool = False) -> bool:
+		"""
+		Return `True` if a new frame should be drawn with the state supplied.
+		The frame where the progress gets to 100% is always drawn, so the last state is never skipped.
+		@force: Draw the frame even if the limits are not met.
+		"""
+		last_state = self._last_state
+		if force or percentage >= 100 and (last_state is None or last_state[0] < 100) or not (
+			self.max_fps and perf_counter() - self._last_time < 1 / self.max_fps
+			or last_state is not None
+			and abs(percentage - last_state[0]) < self.min_delta
+			and text == last_state[1]
+		):
+			return True
+
+		self.pending = True
+		return False
+
+
+	def drawn(self, percentage: float, text: str) -> None:
+		"""Register that a frame was drawn with the state supplied."""
+		self._last_time = perf_counter()
+		self._last_state = (percentage, text)
+		self.pending = False
+
+
+
+
+class StepCounter:
+	"""
+	Thread safe counter of the steps that have not been applied to a bar yet.
+
+	Each thread adds to its own cell, so adding never waits for a lock.
+	The cells are only summed up when the steps are taken.
+	"""
+	__slots__ = ("_local", "_cells", "_finished", "_taken", "_lock")
+
+	def __init__(self) -> None:
+		self._local: Optional[threading.local] = None	# cell of each thread. Created when first needed, since it's big
+		self._cells: list[list] = []	# [steps, thread] of each thread that added steps
+		self._finished = 0	# steps added by the threads that finished
+		self._taken = 0	# steps taken so far
+		self._lock = threading.Lock()	# only used to change the list of cells
+
+
+	def add(self, steps: int) -> None:
+		"""Add `steps` to the counter."""
+		try:
+			self._local.cell[0] += steps	# only this thread writes to its cell
+		except AttributeError:
+			with self._lock:
+				if self._local is None:
+					self._local = threading.local()
+				self._local.cell = [steps, threading.current_thread()]
+				self._cells.append(self._local.cell)
+
+
+	def _total(self) -> int:
+		total = 0
+		for cell in self._cells:
+			total += cell[0]
+		return total + self._finished
+
+
+	@property
+	def pending(self) -> bool:
+		"""Are there any steps that were not taken yet?"""
+		# while the steps are being taken, this may return `True` when it shouldn't, but never the opposite
+		return self._total() != self._taken
+
+
+	def take(self) -> int:
+		"""
+		Return the steps added since the last time and reset the counter to 0.
+		Only one thread can take the steps at a time.
+		"""
+		total = self._total()
+		value, self._taken = total - self._taken, total
+
+		if len(self._cells) > 1 and not all(cell[1].is_alive() for cell in self._cells):
+			# the cells of finished threads won't change anymore, so we don't need to keep them
+			with self._lock:
+				alive = []
+				for cell in self._cells:
+					if cell[1].is_alive():
+						alive.append(cell)
+					else:
+						self._finished += cell[0]
+				self._cells = alive
+		return value
+
+
+
+
+class RenderThread(threading.Thread):
+	"""
+	Thread that draws the bars attached to it at a fixed rate.
+
+	While a bar is attached, `PBar.step()` will just add the steps to a counter
+	of the bar instead of drawing it, so the thread calling it never has to wait for
+	the terminal, and multiple threads can step the same bar safely.
+
+	>>> with RenderThread(my_bar):
+	...		with ThreadPoolExecutor() as executor:
+	...			executor.map(lambda x: my_bar.step(), range(1000))
+	"""
+	def __init__(self, *bars: "bar.PBar", fps: float = 20) -> None:
+		"""
+		@bars: PBar objects to attach to the thread.
+		@fps: Number of times per second that the thread will draw the bars.
+		"""
+		super().__init__(name="pbar-render", daemon=True)
+		self.fps = fps
+		self._bars: list["bar.PBar"] = []
+		self._lock = threading.Lock()
+		self._stop_event = threading.Event()
+
+		for b in bars:
+			self.add(b)
+
+
+	def __enter__(self) -> "RenderThread":
+		self.start()
+		return self
+
+
+	def __exit__(self, *_) -> None:
+		self.stop()
+
+
+	def add(self, bar_obj: "bar.PBar") -> None:
+		"""Attach a bar to the thread."""
+		with self._lock:
+			if bar_obj._render_thread is not None:
+				raise RuntimeError("The bar is already attached to a render thread")
+			bar_obj._render_thread = self
+			self._bars.append(bar_obj)
+
+
+	def remove(self, bar_obj: "bar.PBar") -> None:
+		"""Draw the pending steps of a bar and detach it from the thread."""
+		with self._lock:
+			if bar_obj not in self._bars:
+				return
+			self._bars.remove(bar_obj)
+			bar_obj._render_thread = None
+			with utils.Stdout.lock:
+				bar_obj._print_str(bar_obj._flush_steps())
+
+
+	def run(self) -> None:
+		while not self._stop_event.wait(1 / self.fps):
+			self.render()
+
+
+	def render(self) -> None:
+		"""Draw all the attached bars that changed since the last time, with a single write."""
+		with self._lock, utils.Stdout.lock:
+			bar._print_bars_str("".join(bar_obj._flush_steps() for bar_obj in self._bars))
+
+
+	def stop(self) -> None:
+		"""Stop the thread, drawing the pending steps and detaching all the bars."""
+		self._stop_event.set()
+		if self.is_alive():
+			self.join()
+
+		for bar_obj in tuple(self._bars):
+			self.remove(bar_obj)
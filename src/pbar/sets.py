@@ -1,4 +1,5 @@
-import time
+import time, re
+from functools import lru_cache
 from typing import Callable, Optional, Union
 from . import utils, bar
 from . utils import Term
@@ -11,6 +12,14 @@ FormatSetEntry = dict[str, Union["FormatSetEntry", str]]	# type: ignore
 
 
 _IGNORE_CHARS = "\x1b\n\r\b\a\f\v"
+# tabs are converted to spaces because otherwise we can't tell the length of the string properly
+_POISON_CHARS_TABLE = str.maketrans({"\t": "    "} | dict.fromkeys(_IGNORE_CHARS))
+
+# escaped character, trailing backslash, formatting key, unclosed formatting key, or literal text
+_FORMAT_TOKEN = re.compile(r"\\(.)|(\\)$|<([^>]*)>|(<)|([^\\<]+)", re.DOTALL)
+
+BarAttrGetter = Callable[["bar.PBar"], Union[int, float, str]]
+FormatTemplate = tuple[Union[str, BarAttrGetter], ...]
 
 
 class UnknownSetKeyError(Exception):
@@ -21,19 +30,126 @@ class UnknownSetKeyError(Exception):
 		super().__init__(f"{msg}. Available valid keys: '{set_keys}'.")
 
 
-class _BaseSet(dict):
+# values of the presets of each set class, with a copy of the preset to know if it was modified
+_presets: dict[tuple[type, int], tuple[dict, dict]] = {}
+
+
+def _copy_set(values: dict) -> dict:
+	"""Return a copy of the values of a set, and of its subdicts."""
+	return {key: value.copy() if isinstance(value, dict) else value for key, value in values.items()}
+
+
+class _CachedDict(dict):
+	"""
+	Dict with a cache of values computed from it, which is cleared when the dict is modified in place.
+	The dicts inside of it are converted to `_SubDict`s that clear the same cache.
+	"""
+	__slots__ = ("_cache", )
+
+
+	def _wrap(self, value):
+		"""Return the value that will be stored. Dicts are copied, so their changes clear the cache too."""
+		return _SubDict(self._cache, value) if isinstance(value, dict) else value
+
+
+	# modifying the dict in place must clear the values computed from it
+
+	def __setitem__(self, key, value) -> None:
+		super().__setitem__(key, self._wrap(value))
+		self._cache.clear()
+
+	def __delitem__(self, key) -> None:
+		super().__delitem__(key)
+		self._cache.clear()
+
+	def __ior__(self, other: dict) -> "_CachedDict":
+		self.update(other)
+		return self
+
+	def update(self, *args, **kwargs) -> None:
+		for key, value in dict(*args, **kwargs).items():
+			super().__setitem__(key, self._wrap(value))
+		self._cache.clear()
+
+	def setdefault(self, key, default=None):
+		if key not in self:
+			self[key] = default
+		return super().__getitem__(key)
+
+	def pop(self, *args):
+		value = super().pop(*args)
+		self._cache.clear()
+		return value
+
+	def popitem(self) -> tuple:
+		item = super().popitem()
+		self._cache.clear()
+		return item
+
+	def clear(self) -> None:
+		super().clear()
+		self._cache.clear()
+
+
+
+
+class _SubDict(_CachedDict):
+	"""Dict inside of a set. Modifying it clears the cache of the set."""
+	__slots__ = ()
+
+	def __init__(self, cache: dict, values: dict) -> None:
+		self._cache = cache
+		dict.__init__(self, values)	# the values of the subdicts of a set are never dicts
+
+
+	def __reduce__(self) -> tuple:
+		return dict, (dict(self), )	# a copy doesn't belong to the set anymore
+
+
+
+
+class _BaseSet(_CachedDict):
 	"""Base class for all the customizable sets for the bar (colorset, charset, formatset)"""
 	EMPTY: dict = {}
+	__slots__ = ()
 
 	def __init__(self, new_set: dict) -> None:
 		utils.chk_inst_of(new_set, dict, name="new_set")
-		super().__init__(self._populate(self.EMPTY | new_set))
+		cache = self._cache = {}	# Values computed from the set. Cleared when the set is modified.
+		super().__init__({
+			key: _SubDict(cache, value) if isinstance(value, dict) else value
+			for key, value in self._get_values(new_set).items()
+		})
+
+
+	def _get_values(self, new_set: dict) -> dict:
+		"""
+		Return the values of the set, with all the necessary keys.
+		The values of the presets of the class (like `DEFAULT`) are only computed once.
+		"""
+		cls = type(self)
+		if (preset := _presets.get((cls, id(new_set)))) is not None and preset[0] == new_set:
+			return preset[1]
+
+		values = self._complete(new_set)
+		if any(new_set is value for value in vars(cls).values()):	# the presets may be modified, so we keep a copy
+			_presets[(cls, id(new_set))] = (_copy_set(new_set), values)
+		return values
+
+
+	def _complete(self, new_set: dict) -> dict:
+		"""Return the values of a new set, with all the necessary keys."""
+		return self._populate(self.EMPTY | new_set)
 
 
 	def __repr__(self) -> str:
 		return f"{self.__class__.__name__}({dict(self)})"
 
 
+	def __reduce__(self) -> tuple:
+		return type(self), (dict(self), )
+
+
 	def _populate(self, current_set: dict) -> dict:		# ?: Needs a proper rewrite if we end up needing more subdicts
 		"""
 		Return a new set with all the necessary keys for drawing the bar,
@@ -65,6 +181,7 @@ class _BaseSet(dict):
 
 class ColorSet(_BaseSet):
 	"""Container for the color sets."""
+	__slots__ = ()
 
 	EMPTY: ColorSetEntry = {
 		"empty": "white",
@@ -178,14 +295,20 @@ class ColorSet(_BaseSet):
 
 
 	def parsed_values(self, bg=False) -> dict:
-		"""Convert all values in the ColorSet to parsed color sequences for the terminal"""
-		return self.map_values(lambda val: Term.color(val, bg))
+		"""
+		Convert all values in the ColorSet to parsed color sequences for the terminal.
+		The result is cached until the set is modified, so it should not be modified.
+		"""
+		if (parsed := self._cache.get(("parsed", bg))) is None:
+			parsed = self._cache[("parsed", bg)] = self.map_values(lambda val: Term.color(val, bg))
+		return parsed
 
 
 
 
 class CharSet(_BaseSet):
 	"""Container for the character sets."""
+	__slots__ = ()
 
 	EMPTY: CharSetEntry = {
 		"empty": " ",
@@ -306,10 +429,14 @@ class CharSet(_BaseSet):
 
 	def __init__(self, new_set: Optional[CharSetEntry]) -> None:
 		super().__init__(new_set or self.DEFAULT)
-		self |= self._strip()	# we update with the stripped strings
 
 
-	def _strip(self) -> CharSetEntry:
+	def _complete(self, new_set: CharSetEntry) -> CharSetEntry:
+		return self._strip(super()._complete(new_set))	# we use the stripped strings
+
+
+	@staticmethod
+	def _strip(values: CharSetEntry) -> CharSetEntry:
 		def clean(value) -> str:
 			if len(value) > 1:
 				value = value[0]	# if the string is larger than one, just get the first char
@@ -317,7 +444,7 @@ class CharSet(_BaseSet):
 				return "?"	# we just return a "?" if the char is invalid.
 			return value
 
-		return self.map_values(lambda val: clean(val))	# map the new dict
+		return utils.map_dict(values, clean)	# map the new dict
 
 
 
@@ -332,6 +459,7 @@ class UnknownFormattingKeyError(Exception):
 
 class FormatSet(_BaseSet):
 	"""Container for the formatting sets."""
+	__slots__ = ("_templates", )
 
 	EMPTY: FormatSetEntry = {
 		"inside": "",
@@ -398,79 +526,120 @@ class FormatSet(_BaseSet):
 
 	def __init__(self, new_set: Optional[FormatSetEntry]) -> None:
 		super().__init__(new_set or self.DEFAULT)
+		self._templates: dict[str, FormatTemplate] = {}	# Compiled strings of this set.
+
+
+	@classmethod
+	def _from_parsed(cls, values: dict) -> "FormatSet":
+		"""Create a FormatSet from values that are already complete, without checking them again."""
+		new_set = dict.__new__(cls)
+		dict.__init__(new_set, values)
+		new_set._cache = {}
+		new_set._templates = {}
+		return new_set
 
 
 	@staticmethod
 	def _rm_poison_chars(text: str) -> str:
 		"""Remove "dangerous" characters and convert some"""
-		end_str = ""
-		for char in str(text):
-			if char not in _IGNORE_CHARS:	# Ignore this characters entirely
-				if char == "\t":
-					char = "    "	# Convert tabs to spaces because otherwise we can't tell the length of the string properly
-				end_str += char
-		return end_str
+		return FormatSet._rm_poison_str(text if isinstance(text, str) else str(text))
 
 
 	@staticmethod
-	def get_bar_attr(bar_obj: "bar.PBar", string: str) -> Union[int, float, str]:
-		attrs = {
-			"percentage": lambda: bar_obj.percentage,
-			"prange1": lambda: bar_obj._range[0],
-			"prange2": lambda: bar_obj._range[1],
-			"etime": lambda: bar_obj.etime,
-			"etimef": lambda: time.strftime("%M:%S", time.gmtime(bar_obj.etime)),
-			"rtime": lambda: bar_obj.rtime,
-			"rtimef": lambda: time.strftime("%M:%S", time.gmtime(bar_obj.rtime)),
-			"text": lambda: FormatSet._rm_poison_chars(bar_obj.text) if bar_obj.text else ""
-		}
+	@lru_cache(maxsize=256)
+	def _rm_poison_str(text: str) -> str:
+		return text.translate(_POISON_CHARS_TABLE)
+
 
-		if string not in attrs:	raise UnknownFormattingKeyError(string)
+	@staticmethod
+	def get_attr_getter(string: str) -> BarAttrGetter:
+		"""Return the function that gets the value of the formatting key supplied from a PBar object."""
+		if string not in _BAR_ATTRS:	raise UnknownFormattingKeyError(string)
 
-		return attrs[string]()
+		return _BAR_ATTRS[string]
 
 
 	@staticmethod
-	def parse_string(bar_obj: "bar.PBar", string: str) -> str:
-		"""Parse a string that may contain formatting keys"""
+	def get_bar_attr(bar_obj: "bar.PBar", string: str) -> Union[int, float, str]:
+		return FormatSet.get_attr_getter(string)(bar_obj)
+
+
+	@staticmethod
+	@lru_cache(maxsize=256)
+	def compile_string(string: str) -> FormatTemplate:
+		"""
+		Compile a string that may contain formatting keys into a template, composed of literal strings
+		and the getters of the formatting keys. Use `render_template` to get the final string.
+		"""
 		if string is None:
-			return ""
+			return ()
 
-		end_str = ""				# Final string that will be returned
 		string = FormatSet._rm_poison_chars(string)
-		loop_skip_chars = 0
+		template = []
+
+		for match in _FORMAT_TOKEN.finditer(string):
+			index = match.lastindex
+			if index == 2:	# a backslash at the end of the string is ignored, with everything after it
+				break
+			if index == 4:
+				raise utils.UnexpectedEndOfStringError(string)
+
+			part = (
+				FormatSet.get_attr_getter(match[3]) if index == 3
+				else match[index]	# a literal, or an escaped character
+			)
+
+			if isinstance(part, str) and template and isinstance(template[-1], str):
+				template[-1] += part
+			else:
+				template.append(part)
 
-		# Convert the keys to a final string
-		for index, char in enumerate(string):
-			if loop_skip_chars:
-				loop_skip_chars -= 1
-				continue
+		return tuple(template)
 
-			# skip a character if backslashes are used
-			if char == "\\":
-				if index == len(string) - 1:
-					break
-				end_str += string[index + 1]
-				loop_skip_chars = 1
-				continue
 
-			if char == "<":
-				if ">" not in string[index:]:
-					raise utils.UnexpectedEndOfStringError(string)
-				end_index = string.index(">", index)
-				char = str(FormatSet.get_bar_attr(bar_obj, string[index + 1:end_index]))
+	@staticmethod
+	def render_template(bar_obj: "bar.PBar", template: FormatTemplate) -> str:
+		"""Return the string of a compiled template with the properties of the PBar object specified."""
+		return "".join(
+			part if isinstance(part, str) else str(part(bar_obj))
+			for part in template
+		).strip()
 
-				loop_skip_chars = end_index - index
 
-			end_str += char
-		return end_str.strip()
+	@staticmethod
+	def parse_string(bar_obj: "bar.PBar", string: str) -> str:
+		"""Parse a string that may contain formatting keys"""
+		return FormatSet.render_template(bar_obj, FormatSet.compile_string(string))
 
 
 	def parsed_values(self, bar_obj: "bar.PBar") -> "FormatSet":
 		"""Returns a new FormatSet with all values parsed with the properties of the PBar object specified"""
-		return FormatSet(self.map_values(lambda val: self.parse_string(bar_obj, val)))
+		render_template, get_template = self.render_template, self._get_template
+		return FormatSet._from_parsed({
+			key: render_template(bar_obj, get_template(value)) for key, value in self.items()
+		})
+
+
+	def _get_template(self, string: str) -> FormatTemplate:
+		"""Return the compiled template of a string, compiling it only the first time."""
+		if (template := self._templates.get(string)) is None:
+			template = self._templates[string] = self.compile_string(string)
+		return template
 
 
 	def empty_values(self) -> "FormatSet":
 		"""Convert all values in the FormatSet to strings with spaces of the same size."""
-		return FormatSet(self.map_values(lambda val: " "*len(val)))
+		return FormatSet._from_parsed({key: " "*len(value) for key, value in self.items()})
+
+
+
+_BAR_ATTRS: dict[str, BarAttrGetter] = {
+	"percentage": lambda bar_obj: bar_obj.percentage,
+	"prange1": lambda bar_obj: bar_obj._range[0],
+	"prange2": lambda bar_obj: bar_obj._range[1],
+	"etime": lambda bar_obj: bar_obj.etime,
+	"etimef": lambda bar_obj: time.strftime("%M:%S", time.gmtime(bar_obj.etime)),
+	"rtime": lambda bar_obj: bar_obj.rtime,
+	"rtimef": lambda bar_obj: time.strftime("%M:%S", time.gmtime(bar_obj.rtime)),
+	"text": lambda bar_obj: FormatSet._rm_poison_chars(bar_obj.text) if bar_obj.text else ""
+}
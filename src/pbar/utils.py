@@ -1,13 +1,15 @@
-import sys, re, weakref
+import sys, re, weakref, signal, threading
 import typing
 from io import TextIOWrapper
-from os import system as runsys, get_terminal_size, isatty
+from os import get_terminal_size, isatty
 from time import sleep
 from dataclasses import dataclass
 from contextlib import contextmanager
+from functools import lru_cache
 
 if typing.TYPE_CHECKING:
 	from pbar import PBar
+	from pbar.backend import TermBackend
 
 
 if sys.platform == "win32":
@@ -32,6 +34,13 @@ __all__ = (
 )
 
 T = TypeVar("T")
+
+# tokens of `Term.style_format`: escaped character, trailing backslash, color sequence,
+# unclosed color sequence, text formatting character, and plain text
+_STYLE_TOKEN = re.compile(r"\\(.)|(\\)\Z|<([^>]*)>|(<)|([*_~\-´|#@])|([^\\<*_~\-´|#@]+)", re.DOTALL)
+# same groups, but the backslash ones never match
+_STYLE_TOKEN_NO_BACKSLASH = re.compile(r"(?!)(.)|(?!)(.)|<([^>]*)>|(<)|([*_~\-´|#@])|([^<*_~\-´|#@]+)", re.DOTALL)
+
 Color = Union[tuple[int, int, int], str]
 
 
@@ -328,15 +337,117 @@ def map_dict(dictionary: dict, func: Callable) -> dict:
 
 
 
+class CursorTracker:
+	"""
+	Keeps track of the position of the cursor by interpreting the text written
+	to the terminal, so it doesn't need to be requested to the terminal each time.
+
+	The position is requested to the terminal again every `RESYNC_INTERVAL` calls to
+	`get_pos()`, because some output (like stderr, or input being echoed) can't be tracked.
+	"""
+	RESYNC_INTERVAL: int = 250
+
+	_MOVES = frozenset("ABCDEFGdHfsur")	# CSI commands that move the cursor
+
+	# matches a CSI sequence, any other escape sequence, a control character, or a run of printable characters
+	_TOKEN = re.compile(r"\x1b\[([0-?]*)([ -/]*)([@-~])|\x1b(.)|([\n\v\f\r\b\t])|([^\x1b\n\v\f\r\b\t]+)", re.DOTALL)
+
+	def __init__(self) -> None:
+		self.pos: Optional[tuple[int, int]] = None	# Column and row, starting from 1. None if unknown.
+		self._saved_pos: Optional[tuple[int, int]] = None
+		self._queries = 0
+
+
+	def invalidate(self) -> None:
+		"""Forget the position, so it is requested to the terminal the next time."""
+		self.pos = self._saved_pos = None
+
+
+	def get_pos(self, *, file=None) -> tuple[int, int]:
+		"""Return the tracked cursor position, requesting it to the terminal if needed."""
+		self._queries += 1
+		if self.pos is None or self._queries >= self.RESYNC_INTERVAL:
+			self.pos = Term.get_pos(file=file)
+			self._queries = 0
+		return self.pos
+
+
+	def advance(self, string: str) -> None:
+		"""Update the position with the movement of the cursor caused by writing the string supplied."""
+		if self.pos is None:
+			return
+
+		width, height = Term.get_size()
+		if width <= 0 or height <= 0:
+			self.invalidate()
+			return
+
+		x, y = self.pos	# x may be `width + 1` if the next printable character wraps to the next line
+
+		for csi_params, csi_interm, csi_cmd, esc_cmd, ctrl, text in self._TOKEN.findall(string):
+			if text:
+				if x > width:	# pending wrap
+					x, y = 1, y + 1
+				end = x - 2 + len(text)	# column (starting from 0) of the last character, without wrapping
+				y += end // width
+				x = end % width + 2
+			elif ctrl:
+				if ctrl in "\n\v\f":
+					y += 1
+					if ctrl == "\n":	x = 1	# the terminal translates \n to \r\n
+				elif ctrl == "\r":
+					x = 1
+				elif ctrl == "\b":
+					x = max(min(x, width) - 1, 1)
+				elif ctrl == "\t":
+					x = min((x - 1)//8*8 + 9, width)
+			elif esc_cmd:
+				if esc_cmd == "7":
+					self._saved_pos = (x, y)
+				elif esc_cmd == "8" and self._saved_pos:
+					x, y = self._saved_pos
+				else:	# unknown sequence, we can't know what it does
+					self.invalidate()
+					return
+			elif csi_cmd in self._MOVES and not csi_interm and "?" not in csi_params:
+				params = [int(p) if p.isdigit() else 0 for p in csi_params.split(";")]
+				dist = max(params[0], 1)
+				x = min(x, width)
+				if csi_cmd == "A":		y -= dist
+				elif csi_cmd == "B":	y += dist
+				elif csi_cmd == "C":	x += dist
+				elif csi_cmd == "D":	x -= dist
+				elif csi_cmd == "E":	x, y = 1, y + dist
+				elif csi_cmd == "F":	x, y = 1, y - dist
+				elif csi_cmd == "G":	x = dist
+				elif csi_cmd == "d":	y = dist
+				elif csi_cmd in "Hf":	x, y = max(params[1] if len(params) > 1 else 1, 1), dist
+				elif csi_cmd == "s":	self._saved_pos = (x, y)
+				elif csi_cmd == "u" and self._saved_pos:	x, y = self._saved_pos
+				elif csi_cmd == "r":	x, y = 1, 1	# setting the margins moves the cursor home
+				x = cap_value(x, width, 1)
+
+			y = cap_value(y, height, 1)	# the screen scrolls instead of moving the cursor further
+
+		self.pos = (x, y)
+
+
+
+
 class Stdout(TextIOWrapper):
 	"""
 	A class that may override stdout.
 	Keeps track of the number of newlines sent.
+
+	It is only installed while there are bars that may need to be redrawn
+	when the terminal scrolls, so the rest of the time `print` is not affected.
 	"""
-	triggers: list[weakref.ReferenceType["PBar"]] = []
+	triggers: dict[int, weakref.ReferenceType["PBar"]] = {}	# bars on screen, by their id
 	scroll_offset: int = 0
 	always_check: bool = False
 	enabled: bool = True
+	cursor: CursorTracker = CursorTracker()
+	lock: threading.RLock = threading.RLock()	# Held while writing to the output, so bars and text never interleave.
 
 	def __init__(self, stdout: TextIOWrapper) -> None:
 		super().__init__(stdout, encoding=stdout.encoding)
@@ -348,61 +459,128 @@ class Stdout(TextIOWrapper):
 		@s: String to write.
 		"""
 		s = str(s)
+		with Stdout.lock:
+			self._write(s)
 
+	def _write(self, s: str) -> None:
 		"""
 		We check if the string contains newlines, and if it does, check if the
 		cursor is positioned at the end of the terminal. If it is, we call each
 		trigger with the number of newlines in the string.
+
+		The position of the cursor is tracked with `Stdout.cursor`, so the terminal
+		only needs to be queried once in a while.
 		"""
 
-		if (
-			(count := sum(s.count(c) for c in "\n\v\f") or Stdout.always_check)
-			and Term.SUPPORTED	# only check if terminal is supported
-			and Stdout.triggers	# only if we have triggers
+		if not (
+			Stdout.triggers	# only if we have triggers
 			and Stdout.enabled	# only if enabled
+			and (backend := Stdout._get_term_backend())	# only if the bars are drawn on the terminal
 		):
-			c_pos, t_size, offset = (
-				Term.get_pos(file=self.original)[1],
-				Term.get_size()[1],
-				max(Stdout.scroll_offset, 0) + 1
-			)
-			if c_pos >= t_size - offset:
-				if offset:
-					out("\v"*offset + Term.move_vert(-offset), file=self.original)
-
-				for bar_weakref in Stdout.triggers:
-					# we want to check if the bar is not garbage collected
-					if (bar := bar_weakref()) is None:
-						Stdout.triggers.remove(bar_weakref)
-					else:
-						# we take into account the possible exceeding of the the max size
-						bar._redraw_with_offset(count + (c_pos - (t_size - offset)) - 1)
+			Stdout.cursor.invalidate()	# we are not tracking the cursor while this happens
+			self.original.write(s)
+			return
 
+		if "\n" in s or "\v" in s or "\f" in s or Stdout.always_check:
+			Stdout._chk_scroll(backend, (s.count("\n") + s.count("\v") + s.count("\f")) or 1)
 
 		self.original.write(s)
+		Stdout.cursor.advance(s)
+
+	@staticmethod
+	def _chk_scroll(backend: "TermBackend", count: int) -> None:
+		"""
+		Redraw the triggers if the terminal is going to scroll.
+		@count: Number of newlines that are going to be written.
+		"""
+		c_pos, t_size, offset = (
+			backend.get_pos()[1],
+			backend.get_size()[1],
+			max(Stdout.scroll_offset, 0) + 1
+		)
+		if c_pos >= t_size - offset:
+			if offset:
+				backend.write(scroll_seq := "\v"*offset + Term.move_vert(-offset))
+				Stdout.cursor.advance(scroll_seq)
+
+			for bar_weakref in tuple(Stdout.triggers.values()):
+				# we want to check if the bar is not garbage collected
+				if (bar := bar_weakref()) is not None:
+					# we take into account the possible exceeding of the the max size
+					bar._redraw_with_offset(count + (c_pos - (t_size - offset)) - 1)
+
+	@staticmethod
+	def _get_term_backend() -> Optional["TermBackend"]:
+		"""Return the backend if it draws the bars on the terminal, since otherwise its scrolling doesn't matter."""
+		from . backend import get_backend, TermBackend	# imported here, since the backend module imports this one
+		backend = get_backend()
+		return backend if Term.SUPPORTED and isinstance(backend, TermBackend) else None
 
 	def flush(self):
 		"""Flushes the stdout buffer."""
 		self.original.flush()
 
+	def close(self):
+		"""Does nothing, since closing this would close the original stdout."""
+
+	@staticmethod
+	def install() -> None:
+		"""Override `sys.stdout`. Does nothing if it is already overridden."""
+		if not isinstance(sys.stdout, Stdout):
+			Term.enable_vt()
+			Stdout.cursor.invalidate()	# the text printed before wasn't tracked
+			sys.stdout = Stdout(sys.stdout)
+
+	@staticmethod
+	def uninstall() -> None:
+		"""Restore the original `sys.stdout`, unless something else overrode it after us."""
+		Stdout.cursor.invalidate()	# the text printed from now on won't be tracked
+		if isinstance(sys.stdout, Stdout):
+			sys.stdout = sys.stdout.original
+
 	@staticmethod
 	def add_trigger(bar: "PBar"):
 		"""
 		Register a progress bar that will be redrawn when the terminal screen is scrolled.
+		Bars register themselves when drawn, and are removed when cleared or garbage collected.
+		`sys.stdout` is overridden while there are any triggers.
+		Does nothing if the bars are not drawn on the terminal.
 		"""
-		if len(triggers := Stdout.triggers) >= 1000:	# prevent memory overflow
-			del triggers[0]
-		Stdout.triggers.append(weakref.ref(bar))
-		if Term.SUPPORTED:
-			out("\v" + Term.move_vert(-1))	# HACK: doing this to trigger the Stdout detector
+		if (backend := Stdout._get_term_backend()) is None:
+			return
+
+		key = id(bar)
+		if (bar_weakref := Stdout.triggers.get(key)) is not None and bar_weakref() is bar:
+			return
+
+		with Stdout.lock:
+			Stdout.triggers[key] = weakref.ref(bar, lambda bar_weakref: Stdout._remove_trigger(key, bar_weakref))
+			Stdout.install()
+			# HACK: doing this to trigger the Stdout detector
+			if Stdout.enabled:
+				Stdout._chk_scroll(backend, 1)
+			backend.write(seq := "\v" + Term.move_vert(-1))
+			Stdout.cursor.advance(seq)
+
+	@staticmethod
+	def remove_trigger(bar: "PBar"):
+		"""Stop redrawing a progress bar when the terminal screen is scrolled."""
+		if (bar_weakref := Stdout.triggers.get(id(bar))) is not None and bar_weakref() is bar:
+			Stdout._remove_trigger(id(bar), bar_weakref)
+
+	@staticmethod
+	def _remove_trigger(key: int, bar_weakref: weakref.ReferenceType) -> None:
+		"""Remove a trigger. Restores `sys.stdout` if there are no triggers left."""
+		if Stdout.triggers.get(key) is bar_weakref:	# the id may be used by a new bar already
+			del Stdout.triggers[key]
+		if not Stdout.triggers:
+			Stdout.uninstall()
 
 
 
 
 class Term:
 	"""Class for using terminal sequences a bit easier"""
-	runsys("")		# We need to do this, otherwise Windows won't display special VT100 sequences
-
 	def _is_supported() -> bool:
 		"""Return False if terminal is not supported."""
 		try:
@@ -415,10 +593,109 @@ class Term:
 	SUPPORTED = _is_supported()
 
 
+	_vt_enabled: bool = False	# Was `Term.enable_vt` already called?
+	_size: Optional[tuple[int, int]] = None	# Last known size of the terminal. None if it needs to be requested.
+	_resize_handler: Optional[Callable] = None	# Our `SIGWINCH` handler, once installed.
+	_resize_callbacks: set = set()
+
+
+	@staticmethod
+	def enable_vt() -> None:
+		"""
+		Make the terminal process VT100 sequences. This is only needed on Windows, whose
+		console doesn't do it by default. It is called automatically before drawing any bars.
+		"""
+		if Term._vt_enabled:
+			return
+		Term._vt_enabled = True
+
+		if sys.platform == "win32":
+			kernel32 = ctypes.windll.kernel32
+			handle = kernel32.GetStdHandle(-11)
+			mode = wintypes.DWORD()
+			if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+				kernel32.SetConsoleMode(handle, mode.value | 0x0004)	# ENABLE_VIRTUAL_TERMINAL_PROCESSING
+
+
 	@staticmethod
 	def get_size() -> tuple[int, int]:
-		"""Get size of the terminal. Columns and rows."""
-		return (0, 0) if not Term.SUPPORTED else tuple(get_terminal_size())
+		"""
+		Get size of the terminal. Columns and rows.
+		The size is cached until the terminal is resized, while our `SIGWINCH` handler is installed.
+		"""
+		if not Term.SUPPORTED:
+			return (0, 0)
+		if Term._is_resize_handled():
+			if (size := Term._size) is None:
+				size = Term._size = tuple(get_terminal_size())
+			return size
+
+		# we are not told when the terminal is resized, so the size is requested each time
+		size = tuple(get_terminal_size())
+		if size != Term._size:
+			if Term._size is not None:
+				Term._resized()
+			Term._size = size
+		return size
+
+
+	@staticmethod
+	def on_resize(callback: Callable[[], Any]) -> None:
+		"""
+		Register a function that will be called each time the terminal is resized.
+		Bound methods are referenced weakly, so they don't keep their objects alive.
+
+		Note: The callback may be called from a signal handler, so it should not write to the terminal.
+		"""
+		if hasattr(callback, "__self__"):
+			callback = weakref.WeakMethod(callback, Term._resize_callbacks.discard)
+		Term._resize_callbacks.add(callback)
+
+
+	@staticmethod
+	def _is_resize_handled() -> bool:
+		"""
+		Return `True` if our `SIGWINCH` handler is installed, installing it the first time if possible.
+		Something else may replace it later, so it is checked each time.
+		"""
+		if Term._resize_handler is None:
+			Term._install_resize_handler()
+		return Term._resize_handler is not None and signal.getsignal(signal.SIGWINCH) is Term._resize_handler
+
+
+	@staticmethod
+	def _install_resize_handler() -> None:
+		"""
+		Install a `SIGWINCH` handler that invalidates the cached size, if possible.
+		Signal handlers can only be installed from the main thread, so this does nothing if
+		called from any other thread, and it will be tried again later.
+		"""
+		if not hasattr(signal, "SIGWINCH") or threading.current_thread() is not threading.main_thread():
+			return
+
+		def handler(signum, frame):
+			Term._resized()
+			if callable(old_handler):
+				old_handler(signum, frame)
+
+		try:
+			old_handler = signal.signal(signal.SIGWINCH, handler)
+		except ValueError:	# not the main interpreter
+			return
+		Term._resize_handler = handler
+
+
+	@staticmethod
+	def _resized() -> None:
+		"""Forget the size of the terminal and the sequences computed for it, and call the resize callbacks."""
+		Term._size = None
+		Term._pos_seq.cache_clear()
+		Term._row_starts.cache_clear()
+		for callback in tuple(Term._resize_callbacks):
+			if isinstance(callback, weakref.WeakMethod):
+				callback = callback()
+			if callback is not None:
+				callback()
 
 
 	# Thanks to https://stackoverflow.com/a/69582478/14546524
@@ -475,10 +752,45 @@ class Term:
 		"""
 		chk_seq_of_len(pos, 2)
 
-		position = (int(pos[0]) + int(offset[0]),
-					int(pos[1]) + int(offset[1]))
+		return Term._pos_seq(int(pos[0]) + int(offset[0]), int(pos[1]) + int(offset[1]))
+
+
+	@staticmethod
+	@lru_cache(maxsize=4096)
+	def _pos_seq(x: int, y: int) -> str:
+		"""
+		Fast version of `Term.set_pos` for internal use. The values are not checked.
+		The sequences are cached until the terminal is resized.
+		"""
+		return f"\x1b[{y};{x}f"
+
+
+	@staticmethod
+	def row_starts(
+		pos: tuple[SupportsInt, SupportsInt],
+		height: SupportsInt,
+		offset: tuple[SupportsInt, SupportsInt] = (0, 0)
+	) -> tuple[str, ...]:
+		"""
+		Return the sequences that position the cursor at the start of each
+		row of a rectangle of the height supplied.
+		@pos: Tuple containing the X and Y position values of the top left corner.
+		@height: Number of rows.
+		@offset: Offset applied to `pos`. (Can be negative)
+		"""
+		chk_seq_of_len(pos, 2)
+
+		return Term._row_starts(
+			int(pos[0]) + int(offset[0]), int(pos[1]) + int(offset[1]), int(height)
+		)
+
 
-		return f"\x1b[{position[1]};{position[0]}f"
+	@staticmethod
+	@lru_cache(maxsize=256)
+	def _row_starts(x: int, y: int, height: int) -> tuple[str, ...]:
+		"""Fast version of `Term.row_starts` for internal use. The values are not checked."""
+		pos_seq = Term._pos_seq
+		return tuple(pos_seq(x, y + row) for row in range(height))
 
 
 	@staticmethod
@@ -498,6 +810,17 @@ class Term:
 		@color:	Tuple with RGB values, a HTML color name, or a hex string.
 		@bg:	This color will be displayed on the background
 		"""
+		if isinstance(color, list):
+			color = tuple(color)
+		try:
+			return Term._color(color, bg)
+		except TypeError:	# unhashable value, so it can't be cached
+			return Term._color.__wrapped__(color, bg)
+
+
+	@staticmethod
+	@lru_cache(maxsize=256)
+	def _color(color: Optional[Union[tuple[int, int, int], str]], bg: bool) -> str:
 		crgb = convert_color(color, "RGB")
 		type = 48 if bg else 38
 
@@ -557,7 +880,7 @@ class Term:
 		ts = Term.get_size()
 		return (
 			Term.CURSOR_HOME
-			+ "".join(Term.set_pos((0, row)) + char[0]*ts[0] for row in range(ts[1] + 1))
+			+ "".join(row + char[0]*ts[0] for row in Term._row_starts(0, 0, ts[1] + 1))
 		)
 
 
@@ -568,7 +891,7 @@ class Term:
 		When the cursor reaches this limit, it will scroll the screen buffer up.
 		@limit: The vertical scroll limit.
 		@always_check: If `True`, the cursor position will be checked each time
-		text is sent to stdout (slower). Otherwise, only when a newline occurs (faster).
+		text is sent to stdout. Otherwise, only when a newline occurs.
 		"""
 		Stdout.scroll_offset = limit
 		Stdout.always_check = always_check
@@ -587,6 +910,7 @@ class Term:
 	):
 		"""Context manager for alternating different terminal sequences."""
 		# ------------------ Enter ------------------
+		Term.enable_vt()
 		out(
 			(Term.BUFFER_NEW * new_buffer)
 			+ (Term.CURSOR_HIDE * hide_cursor)
@@ -641,62 +965,41 @@ class Term:
 		@reset: Will formatting be resetted at the end?
 		@ignore_backslashes: Ignore backslashes in the string.
 		"""
-		# i hate it too, yes
-		invert = underline = dim = sthrough = invisible = bold = italic = blink = False
-		loop_skip_chars = 0
-		end_str = ""
-
-		for index, char in enumerate(string):
-			if loop_skip_chars:
-				loop_skip_chars -= 1
-				continue
-
-			if not ignore_backslashes and char == "\\":
-				# skip a character if backslashes are used
-				if index == len(string) - 1:
-					break
-				end_str += string[index + 1]
-				loop_skip_chars = 1
-				continue
-
-
-			# simply add escape characters depending on the state of each format
-			if char == "*":	# bold
-				char = Term.NO_BOLD if bold else Term.BOLD
-				bold = not bold
-			elif char == "_":	# italic
-				char = Term.NO_ITALIC if italic else Term.ITALIC
-				italic = not italic
-			elif char == "~":	# strikethrough
-				char = Term.NO_STHROUGH if sthrough else Term.STHROUGH
-				sthrough = not sthrough
-			elif char == "-":	# underline
-				char = Term.NO_UNDERLINE if underline else Term.UNDERLINE
-				underline = not underline
-			elif char == "´":	# blink
-				char = Term.NO_BLINK if blink else Term.BLINK
-				blink = not blink
-			elif char == "|":	# invert
-				char = Term.NO_INVERT if invert else Term.INVERT
-				invert = not invert
-			elif char == "#":	# dim
-				char = Term.NO_DIM if dim else Term.DIM
-				dim = not dim
-			elif char == "@":	# invisible
-				char = Term.NO_INVISIBLE if invisible else Term.INVISIBLE
-				invisible = not invisible
-
-
-			elif char == "<":	# a color sequence is going to be used
-				if ">" not in string[index:]:	# if the sequence is not closed, raise error
-					raise UnexpectedEndOfStringError(string)
-				end_index = string.index(">", index)	# we get the index of the end of the sequence
-				char = Term._parse_str_formatting(string[index + 1:end_index])	# parse the sequence
-				loop_skip_chars = end_index - index	# we now tell the loop to skip the parsed text
-
-			end_str += char
-
-		return end_str + (Term.RESET if reset else "")
+		try:
+			return Term._style_format(string, reset, ignore_backslashes)
+		except TypeError:	# unhashable value, so it can't be cached
+			return Term._style_format.__wrapped__(string, reset, ignore_backslashes)
+
+
+	@staticmethod
+	@lru_cache(maxsize=1024)
+	def _style_format(string: str, reset: bool, ignore_backslashes: bool) -> str:
+		toggled: set[str] = set()	# formatting characters currently enabled
+		end_str = []
+
+		for match in (_STYLE_TOKEN_NO_BACKSLASH if ignore_backslashes else _STYLE_TOKEN).finditer(string):
+			index = match.lastindex
+			if index == 1:	# escaped character
+				end_str.append(match[1])
+			elif index == 2:	# a backslash at the end of the string is ignored
+				break
+			elif index == 3:	# color sequence
+				end_str.append(Term._parse_str_formatting(match[3]))
+			elif index == 4:	# the sequence is not closed
+				raise UnexpectedEndOfStringError(string)
+			elif index == 5:	# text formatting
+				char = match[5]
+				enable, disable = _STYLE_TOGGLES[char]
+				if char in toggled:
+					toggled.remove(char)
+					end_str.append(disable)
+				else:
+					toggled.add(char)
+					end_str.append(enable)
+			else:
+				end_str.append(match[6])
+
+		return "".join(end_str) + (Term.RESET if reset else "")
 
 
 	@staticmethod
@@ -772,3 +1075,18 @@ class Term:
 	CURSOR_HOME: str = "\x1b[H"
 	INVERT_ALL: str = "\x1b[?5h"
 	NO_INVERT_ALL: str ="\x1b[?5l"
+
+
+
+
+# characters that toggle text formatting in `Term.style_format`, with the sequences that enable and disable them
+_STYLE_TOGGLES: dict[str, tuple[str, str]] = {
+	"*": (Term.BOLD, Term.NO_BOLD),
+	"_": (Term.ITALIC, Term.NO_ITALIC),
+	"~": (Term.STHROUGH, Term.NO_STHROUGH),
+	"-": (Term.UNDERLINE, Term.NO_UNDERLINE),
+	"´": (Term.BLINK, Term.NO_BLINK),
+	"|": (Term.INVERT, Term.NO_INVERT),
+	"#": (Term.DIM, Term.NO_DIM),
+	"@": (Term.INVISIBLE, Term.NO_INVISIBLE),
+}